@@ -1,49 +1,29 @@
-import shutil
-import src.gui.ui
 import argparse
-from PyQt6 import QtCore, QtGui
-from PyQt6.QtWidgets import QApplication
+import src.cli as cli
 from src.logs import *
 
 
-def init_argparse() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser(
-        usage="%(prog)s [OPTIONS]",
-        description="Walk through Cognos's directory tree"
-                    "and export the filenames to an excel file."
-    )
-    parser.add_argument(
-        "-H", "--headless", action="store_true",
-        help="Start Selenium headless (invisible)"
-    )
-    parser.add_argument(
-        "-u", "--uname",
-        help="Specify the user. This can be changed in GUI"
-    )
-    parser.add_argument(
-        "-p", "--passw",
-        help="Specify the password. This can be changed in GUI"
-    )
-    parser.add_argument(
-        "-d", "--debuglevel",
-        help="Set the logging level"
-    )
-    parser.add_argument(
-        "-x", "--executable",
-        help="Set the location of the firefox executable"
-    )
-    parser.add_argument(
-        "-g", "--geckodriver",
-        help="Set the location of the geckodriver executable"
-    )
-    return parser
-
-
 def main() -> None:
     JSpider.setLevel(logging.INFO)
     try:
-        parser = init_argparse()
+        parser = cli.init_argparse()
         args, remaining_args = parser.parse_known_args()
+    except:
+        JSpider.critical("Something went wrong with arg parsing")
+        sys.exit(1)
+
+    if args.batch:
+        # Don't so much as import Qt
+        sys.exit(cli.run(args))
+    gui(args, remaining_args)
+
+
+def gui(args: argparse.Namespace, remaining_args: list[str]) -> None:
+    """Start the GUI with the settings from the command line"""
+    from PyQt6 import QtCore, QtGui
+    from PyQt6.QtWidgets import QApplication
+    import src.gui.ui
+    try:
         app = QApplication(remaining_args)
         app.setWindowIcon(QtGui.QIcon(".\\assets\\head_icon.svg"))
         File = QtCore.QFile(".\\assets\\elegantdark.qss")
@@ -54,17 +34,22 @@ def main() -> None:
         qss = QtCore.QTextStream(File)
         app.setStyleSheet(qss.readAll())
     except:
-        JSpider.critical("Something went wrong with arg parsing")
+        JSpider.critical("Something went wrong starting the GUI")
         sys.exit(1)
 
     ui = src.gui.ui.Ui()
-    ui.TravelPath = "/Finance/"
+    ui.TravelPath = args.start_path
+    ui.TeamContent = not args.my_content
+    if args.export:
+        ui.ExportFileName = args.export
 
     if args.headless:
         ui.runButton.setText("Run Headless")
-        ui.worker.headless = True
-    else:
-        ui.worker.headless = False
+    cli.configure(ui.worker.crawler, args)
+    if args.resume:
+        # The worker copies these out of the ui when it starts
+        ui.TravelPath = ui.worker.crawler.travel_path
+        ui.TeamContent = ui.worker.crawler.team_content
 
     if args.uname:
         ui.usernameInput.setText(args.uname)
@@ -74,25 +59,11 @@ def main() -> None:
         ui.passwordInput.setText(args.passw)
         JSpider.info("Password autoset from command line (omitted)")
 
-    if args.debuglevel:
-        JSpider.setLevel(int(args.debuglevel))
-        logging.getLogger("JSpider_worker").setLevel(int(args.debuglevel))
-        JSpider.critical(
-            "Debug level set from command line: %s", args.debuglevel)
+    if args.log_spill:
+        ui.logWidget.store.spill_to(args.log_spill)
 
-    if args.executable:
-        ui.executable = args.executable
-    else: 
-        if tmp:=shutil.which("firefox.exe"): #try to find firefox with shutil
-            ui.executable = tmp
-        else:
-            JSpider.critical("Could not find a valid firefox distro.")
-            sys.exit(1)
-    if args.geckodriver:
-        ui.geckodriver = args.geckodriver
-    else:
-        # by default assume that we're using the included geckodriver package
-        ui.geckodriver = "./binaries/geckodriver.exe"
+    ui.executable = cli.find_executable(args)
+    ui.geckodriver = cli.find_geckodriver(args)
     JSpider.debug("UI started")
 
     # exit
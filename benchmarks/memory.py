@@ -0,0 +1,74 @@
+"""
+How many bytes does each FolderElem cost? Run with
+    python -m src.benchmarks.memory [nodes]
+Compares the slotted FolderElem against the old representation,
+which kept its own path, link and linkpath strings in a __dict__.
+"""
+import sys
+import tracemalloc
+from typing import Callable, List
+
+from src.driver.folderelem import FolderElem
+
+LINKBASE = "https://cognos-prod.ec.sou.edu/ibmcognos11/bi/?pathRef=.public_folders%2F"
+
+
+class LegacyElem():
+    """FolderElem as it used to be"""
+
+    def __init__(self, type: FolderElem.ElemType,
+                 name: str, path: List[str], link: str = ""):
+        self.type = type
+        self.name = name
+        self.path = f"/{'/'.join(path)}/" if path else "/"
+        self.link = link
+        self.linkpath = self.path+self.name+"/" if type == "Folder" else None
+
+
+def make_legacy(path: List[str], name: str) -> LegacyElem:
+    return LegacyElem(FolderElem.ElemType.Report, name, path,
+                      LINKBASE + "/".join(path+[name]))
+
+
+def make_compact(path: List[str], name: str) -> FolderElem:
+    return FolderElem(FolderElem.ElemType.Report, name, path, linkbase=LINKBASE)
+
+
+def folders(nodes: int, fanout: int = 10, per_folder: int = 50) -> List[List[str]]:
+    """Enough folder paths, breadth first, to hold nodes rows"""
+    paths = [["Finance"]]
+    i = 0
+    while len(paths)*per_folder < nodes:
+        paths += [paths[i] + [f"Subfolder {j}"] for j in range(fanout)]
+        i += 1
+    return paths
+
+
+def measure(make: Callable, nodes: int, per_folder: int = 50) -> float:
+    """Bytes per node to hold nodes elements"""
+    paths = folders(nodes, per_folder=per_folder)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    elems = []
+    for i in range(nodes):
+        # Every row in a folder gets its own copy of the path list,
+        # like the drivers hand out.
+        path = list(paths[i // per_folder])
+        elems.append(make(path, f"Report number {i}"))
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del elems
+    return used / nodes
+
+
+def main() -> None:
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    legacy = measure(make_legacy, nodes)
+    compact = measure(make_compact, nodes)
+    print(f"{nodes} nodes")
+    print(f"  legacy:  {legacy:7.1f} bytes/node")
+    print(f"  compact: {compact:7.1f} bytes/node ({100*compact/legacy:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
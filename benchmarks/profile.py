@@ -0,0 +1,94 @@
+"""
+What does a lean browser profile save? Run with
+    python -m src.benchmarks.profile [--latency 20]
+Crawls the simulator (with its stylesheet, font and icons turned on)
+once per profile, loading every folder by pathRef so each one is a full
+page load. Reports the mean page load, how many assets firefox fetched,
+and how much memory firefox was using at the end (that needs psutil).
+Until this has been run against a real firefox, lean and bare stay
+in seleniumdriver.EXPERIMENTAL_PROFILES. A bare crawl that stalls in a
+visibility wait means skipping stylesheets doesn't work.
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+import src.driver.crawler as crawler
+from src.benchmarks.simulator import PASSWORD, Simulator, Tree, tree_arguments
+from src.cli import ConsoleFilter
+
+PROFILES = ["full", "lean", "bare"]
+
+
+def firefox_memory(crawl: crawler.Crawler) -> float | None:
+    """MB of memory used by the pooled firefox and its content processes"""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    driver = crawl.pool.idle[-1][2].driver if crawl.pool and crawl.pool.idle else None
+    if driver is None:
+        return None
+    browser = psutil.Process(driver.capabilities["moz:processID"])
+    processes = [browser] + browser.children(recursive=True)
+    return sum(process.memory_info().rss for process in processes) / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare browser profiles")
+    tree_arguments(parser)
+    parser.set_defaults(depth=2, assets=True)
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=PROFILES)
+    parser.add_argument("--geckodriver", default=shutil.which("geckodriver") or "")
+    parser.add_argument("--executable", default=shutil.which("firefox") or "")
+    args = parser.parse_args()
+    if not (args.geckodriver and args.executable):
+        parser.error("This needs firefox and geckodriver. "
+                     "Put them on the PATH or use --executable and --geckodriver")
+
+    tree = Tree(args.depth, args.fanout, args.files)
+    logger = logging.getLogger("benchmark")
+    handler = logging.StreamHandler(sys.stderr)
+    handler.addFilter(ConsoleFilter())
+    logger.addHandler(handler)
+    logger.setLevel(logging.WARNING)
+
+    print(f"{'profile':8} {'page load':>10} {'traverse':>9} {'assets':>7} {'memory':>8}")
+    for profile in args.profiles:
+        sim = Simulator(tree, args.latency/1000, args.jitter/1000,
+                        assets=args.assets, page_size=args.page_size,
+                        capacity=args.capacity, failures=args.failures,
+                        broken=args.broken)
+        crawl = crawler.Crawler(logger)
+        crawl.base_url = sim.start()
+        crawl.username, crawl.password = "benchmark", PASSWORD
+        crawl.travel_path = "/Finance/"
+        crawl.direct_nav = True
+        crawl.headless = True
+        crawl.profile = profile
+        crawl.geckodriver = args.geckodriver
+        crawl.executable = args.executable
+        with tempfile.TemporaryDirectory() as tmp:
+            crawl.export_filename = os.path.join(tmp, "benchmark.xlsx")
+            try:
+                crawl.run()
+                # The browser is back in the pool, so it's still up to measure
+                memory = firefox_memory(crawl)
+            finally:
+                crawl.close()
+                sim.stop()
+
+        loads = crawl.metrics.histograms.get("load_path")
+        traverse = crawl.metrics.histograms.get("traverse")
+        print(f"{profile:8} "
+              f"{1000*loads.sum/loads.count if loads else 0:8.0f} ms "
+              f"{traverse.sum if traverse else 0:7.1f} s "
+              f"{sum(sim.asset_requests.values()):7} "
+              + (f"{memory:5.0f} MB" if memory is not None else "    n/a"))
+
+
+if __name__ == "__main__":
+    main()
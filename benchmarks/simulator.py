@@ -0,0 +1,490 @@
+"""
+A stand-in for cognos to crawl without touching the real one. Run with
+    python -m src.benchmarks.simulator [--depth 3 --fanout 4 --files 20 --latency 50]
+then point the spider at it with --base-url http://127.0.0.1:8000/ibmcognos11/bi
+(any username, password "password").
+
+It serves just enough of the portal for SeleniumDriver: the login form,
+the team/my content slideouts with their folder pane, breadcrumbs and
+tr[data-name] rows with type icons, and pathRef links. It also serves the
+REST calls HttpDriver makes. The tree is made up on the fly from its shape,
+so a 100k node tree costs nothing to hold.
+
+With --assets the portal also pulls in a stylesheet, a web font and an
+icon per row, like the real one does, and counts the requests for them.
+With --page-size the folder table loads that many rows at a time, more
+each time it's scrolled to the bottom, the way cognos' DataTables do.
+With --failures some listings fail with a 500, and folders given with
+--broken always do.
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from src.driver.folderelem import FolderElem
+from src.driver.httpdriver import TYPES
+
+PREFIX = "/ibmcognos11/bi"
+PASSWORD = "password"
+ROOTS = {"team": ".public_folders", "my": ".my_folders"}
+# What the REST api calls each type
+REST_TYPES = {type: name for name, type in TYPES.items()}
+# The types files cycle through, all of which both drivers know
+FILE_TYPES = [FolderElem.ElemType.Report, FolderElem.ElemType.Query,
+              FolderElem.ElemType.Active_Report, FolderElem.ElemType.Dashboard,
+              FolderElem.ElemType.Report_View, FolderElem.ElemType.Data_module,
+              FolderElem.ElemType.Package, FolderElem.ElemType.Story,
+              FolderElem.ElemType.Agent, FolderElem.ElemType.Uploaded_file]
+
+
+class SimulatedFailure(Exception):
+    """A listing the simulator decided should fail"""
+
+
+class Tree():
+    """
+    A made up folder tree. Each root folder (Finance, by default) and every
+    folder under it, down to depth levels, holds fanout subfolders
+    ("Folder 0", "Folder 1"...) and files files. Folders at the bottom
+    only hold files, or nothing at all if files is 0.
+    """
+
+    def __init__(self, depth: int = 3, fanout: int = 4, files: int = 20,
+                 roots: List[str] | None = None):
+        self.depth = depth
+        self.fanout = fanout
+        self.files = files
+        self.roots = roots or ["Finance"]
+
+    def listing(self, path: List[str]) -> List[tuple[str, FolderElem.ElemType]]:
+        """(name, type) of everything in a folder. KeyError if there's no such folder."""
+        if not path:
+            return [(name, FolderElem.ElemType.Folder) for name in self.roots]
+        if path[0] not in self.roots or len(path) > self.depth + 1:
+            raise KeyError(path)
+        for name in path[1:]:
+            number = name[len("Folder "):]
+            if not name.startswith("Folder ") or not number.isdigit() \
+                    or int(number) >= self.fanout:
+                raise KeyError(path)
+
+        listing = []
+        if len(path) <= self.depth:
+            listing += [(f"Folder {i}", FolderElem.ElemType.Folder)
+                        for i in range(self.fanout)]
+        for i in range(self.files):
+            type = FILE_TYPES[i % len(FILE_TYPES)]
+            listing.append((f"{type.name.replace('_', ' ')} {i}", type))
+        return listing
+
+    def folders(self) -> int:
+        """How many folders there are under (and including) one root"""
+        return sum(self.fanout**level for level in range(self.depth + 1))
+
+    def rows(self) -> int:
+        """How many rows a crawl of one root should find"""
+        if self.files:
+            return self.folders()*self.files
+        # Only the empty folders at the bottom show up
+        return self.fanout**self.depth
+
+    def nodes(self) -> int:
+        """How many files and folders are under one root"""
+        return self.folders()*self.files + self.folders() - 1
+
+
+# Enough jQuery for SeleniumDriver.disable_animations
+SHIM = """
+function $(selector) {
+    return {append: function (html) {
+        document.querySelector(selector).insertAdjacentHTML("beforeend", html);
+    }};
+}
+"""
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>IBM Cognos Analytics</title></head>
+<body>
+<input id="CAMUsername"> <input id="CAMPassword" type="password">
+<button class="signInBtn">Sign in</button>
+<div class="incorrectLoginText"></div>
+<script>
+var CONFIG = __CONFIG__;
+__SHIM__
+document.querySelector(".signInBtn").addEventListener("click", function () {
+    // Synchronous, so the answer is in by the time the click returns
+    var request = new XMLHttpRequest();
+    request.open("PUT", CONFIG.prefix + "/v1/login", false);
+    request.setRequestHeader("Content-Type", "application/json");
+    request.send(JSON.stringify({parameters: [
+        {name: "CAMUsername", value: document.getElementById("CAMUsername").value},
+        {name: "CAMPassword", value: document.getElementById("CAMPassword").value}]}));
+    if (request.status == 200) {
+        window.location = CONFIG.prefix + "/?perspective=home";
+    } else {
+        document.querySelector(".incorrectLoginText").innerHTML =
+            "The provided credentials are invalid.";
+    }
+});
+</script>
+</body></html>
+"""
+
+# The heavy bits of the portal, for --assets
+ASSETS = {
+    "style.css": ("text/css", b"""
+@font-face {font-family: Simulated; src: url("font.woff");}
+body {font-family: Simulated, sans-serif;}
+.slideout {background: url("background.png");}
+"""),
+    "font.woff": ("font/woff", bytes(200_000)),
+    "background.png": ("image/png", base64.b64decode(
+        "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII=")),
+}
+ASSETS["icon.png"] = ASSETS["background.png"]
+
+PORTAL_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Welcome</title>
+__HEAD__
+<style>
+.slideout {position: fixed; left: 220px; top: 0; bottom: 0; width: 600px;}
+.dataTables_scrollBody {height: 80vh; overflow-y: auto;}
+</style></head>
+<body>
+<div class="incorrectLoginText"></div>
+<div id="com.ibm.bi.contentApps.teamFoldersSlideout" role="button">Team content</div>
+<div id="com.ibm.bi.contentApps.myContentFoldersSlideout" role="button">My content</div>
+<script>
+var CONFIG = __CONFIG__;
+__SHIM__
+var PANES = {team: "teamFoldersSlideoutContent", my: "myContentSlideoutContent"};
+var state = {root: null, path: [], loaded: 0, total: 0, loading: null};
+
+function escape(text) {
+    return text.replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/"/g, "&quot;");
+}
+
+function openPane(root, path) {
+    var old = document.querySelector(".slideout");
+    if (old) old.remove();
+    var pane = document.createElement("div");
+    pane.id = PANES[root];
+    pane.className = "slideout";
+    // The empty breadcrumb keeps readiness checks waiting until the first listing
+    pane.innerHTML = '<div class="crumbs"><div class="breadcrumbCurrent"></div></div>'
+        + '<div class="dataTables_processing" style="display: none">Loading...</div>'
+        + '<div class="dataTables_scrollBody"><table class="dataTable"><tbody>'
+        + '</tbody></table></div>';
+    var body = pane.querySelector(".dataTables_scrollBody");
+    body.addEventListener("scroll", function () {
+        if (body.scrollTop + body.clientHeight >= body.scrollHeight - 1) more();
+    });
+    pane.addEventListener("click", function (event) {
+        var link = event.target.closest('[role="link"]');
+        if (link) {
+            show(state.path.concat([link.closest("tr").getAttribute("data-name")]));
+        } else if (event.target.closest('.breadcrumbPrevious [role="button"]')) {
+            show(state.path.slice(0, -1));
+        }
+    });
+    document.body.appendChild(pane);
+    state.root = root;
+    show(path);
+}
+
+function list(path, start, done) {
+    var request = new XMLHttpRequest();
+    request.open("GET", CONFIG.prefix + "/sim/list?root=" + state.root
+                 + "&path=" + encodeURIComponent(path.join("/")) + "&start=" + start);
+    request.onload = function () {
+        if (request.status == 200) done(JSON.parse(request.responseText));
+    };
+    request.send();
+}
+
+function show(path) {
+    state.loading = null;
+    list(path, 0, function (page) {
+        state.path = path;
+        state.loaded = page.rows.length;
+        state.total = page.total;
+        render(page.rows);
+    });
+}
+
+// The next page of a folder that didn't fit in the first one
+function more() {
+    if (state.loading || state.loaded >= state.total) return;
+    var path = state.path, processing = document.querySelector(".dataTables_processing");
+    state.loading = path;
+    processing.style.display = "";
+    list(path, state.loaded, function (page) {
+        if (state.loading !== path) return;  // Moved on to another folder
+        state.loading = null;
+        processing.style.display = "none";
+        state.loaded += page.rows.length;
+        document.querySelector(".slideout tbody").insertAdjacentHTML("beforeend", rows(page.rows));
+    });
+}
+
+function rows(listing) {
+    return listing.map(function (row) {
+        var name = escape(row[0]), title = escape(row[1]);
+        var icon = CONFIG.assets ? '<img src="' + CONFIG.prefix
+            + '/sim/assets/icon.png?' + encodeURIComponent(row[1]) + '">' : '';
+        return '<tr data-name="' + name + '"><td><div title="' + title
+            + '" role="img">' + icon + '</div></td><td><div role="'
+            + (row[1] == "Folder" ? "link" : "text") + '">' + name + '</div></td></tr>';
+    }).join("");
+}
+
+function render(listing) {
+    var pane = document.getElementById(PANES[state.root]);
+    pane.querySelector(".dataTables_processing").style.display = "none";
+    var crumbs = "";
+    if (state.path.length) {
+        var parent = state.path.length > 1 ? state.path[state.path.length-2] : "Content";
+        crumbs = '<ul class="breadcrumbPrevious"><li><div role="button">'
+            + escape(parent) + '</div></li></ul><div class="breadcrumbCurrent">'
+            + escape(state.path[state.path.length-1]) + '</div>';
+    }
+    pane.querySelector(".crumbs").innerHTML = crumbs;
+    pane.querySelector("tbody").innerHTML = rows(listing);
+}
+
+document.getElementById("com.ibm.bi.contentApps.teamFoldersSlideout")
+    .addEventListener("click", function () { openPane("team", []); });
+document.getElementById("com.ibm.bi.contentApps.myContentFoldersSlideout")
+    .addEventListener("click", function () { openPane("my", []); });
+if (CONFIG.root) openPane(CONFIG.root, CONFIG.path);
+</script>
+</body></html>
+"""
+
+
+class Simulator():
+    """
+    Serve a Tree like cognos would. Every folder listing (in the portal
+    or over REST) takes latency seconds, plus up to jitter more.
+    With capacity set, listing more folders than that at once slows
+    every listing down in proportion, like an overloaded server.
+    A failures fraction of listings fail at random, and the folders in
+    broken (like "/Finance/Folder 1/") fail every time.
+    """
+
+    def __init__(self, tree: Tree, latency: float = 0, jitter: float = 0,
+                 host: str = "127.0.0.1", port: int = 0, assets: bool = False,
+                 page_size: int = 0, capacity: int = 0, failures: float = 0,
+                 broken: List[str] | None = None):
+        self.tree = tree
+        self.latency = latency
+        self.jitter = jitter
+        self.capacity = capacity
+        self.failures = failures
+        self.broken = set(broken or [])
+        self.failed = 0  # Listings that failed on purpose
+        self.active = 0  # Listings under way
+        self.assets = assets
+        self.page_size = page_size  # Rows the portal loads at a time. 0 for all.
+        self.asset_requests: dict[str, int] = {}  # by asset name
+        simulator = self
+
+        class Handler(SimulatorHandler):
+            sim = simulator
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.listings = 0  # How many folders have been listed
+        self.__lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{PREFIX}"
+
+    def start(self) -> str:
+        """Serve in the background. Returns the base url to crawl."""
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def asset(self, name: str) -> tuple[str, bytes]:
+        """(content type, body) of an asset, counting the request"""
+        with self.__lock:
+            self.asset_requests[name] = self.asset_requests.get(name, 0) + 1
+        return ASSETS[name]
+
+    def list(self, path: List[str], start: int = 0) -> List[tuple[str, FolderElem.ElemType]]:
+        """
+        List a folder, as slowly as cognos would. Each later page
+        (from start) takes as long again, but doesn't count as a listing.
+        """
+        listing = self.tree.listing(path)
+        if "/" + "".join(name + "/" for name in path) in self.broken \
+                or random.random() < self.failures:
+            with self.__lock:
+                self.failed += 1
+            raise SimulatedFailure(path)
+        with self.__lock:
+            self.active += 1
+            load = max(1, self.active/self.capacity) if self.capacity else 1
+            if not start:
+                self.listings += 1
+        try:
+            time.sleep(load*(self.latency + random.uniform(0, self.jitter)))
+        finally:
+            with self.__lock:
+                self.active -= 1
+        return listing
+
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    """Answer the few requests the drivers make"""
+    protocol_version = "HTTP/1.1"
+    sim: Simulator
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def send(self, status: int, body: str | bytes,
+             type: str = "application/json", headers: dict = {}) -> None:
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def page(self, template: str, config: dict) -> None:
+        config["assets"] = self.sim.assets
+        head = (f'<link rel="stylesheet" href="{PREFIX}/sim/assets/style.css">'
+                if self.sim.assets else "")
+        self.send(200, template.replace("__CONFIG__", json.dumps(config))
+                  .replace("__SHIM__", SHIM).replace("__HEAD__", head),
+                  "text/html; charset=utf-8")
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path in (PREFIX, PREFIX + "/"):
+            if "pathRef" in query:
+                ref = query["pathRef"][0]
+                root = "team" if ref.startswith(ROOTS["team"]) else "my"
+                path = [name for name in ref.split("/")[1:] if name]
+                self.page(PORTAL_PAGE, {"prefix": PREFIX, "root": root, "path": path})
+            elif "perspective" in query:
+                self.page(PORTAL_PAGE, {"prefix": PREFIX, "root": None, "path": []})
+            else:
+                self.page(LOGIN_PAGE, {"prefix": PREFIX})
+        elif url.path.startswith(PREFIX + "/sim/assets/") \
+                and url.path.rsplit("/", 1)[1] in ASSETS:
+            type, body = self.sim.asset(url.path.rsplit("/", 1)[1])
+            self.send(200, body, type)
+        elif url.path == PREFIX + "/sim/list":
+            path = [name for name in query.get("path", [""])[0].split("/") if name]
+            start = int(query.get("start", ["0"])[0])
+            try:
+                listing = self.sim.list(path, start)
+            except KeyError:
+                self.send(404, "{}")
+                return
+            except SimulatedFailure:
+                self.send(500, "{}")
+                return
+            page = listing[start:start + self.sim.page_size] \
+                if self.sim.page_size else listing
+            self.send(200, json.dumps({
+                "rows": [[name, type.name.replace("_", " ")] for name, type in page],
+                "total": len(listing)}))
+        elif url.path.startswith(PREFIX + "/v1/objects/") \
+                and url.path.endswith("/items"):
+            object_id = unquote(url.path[len(PREFIX + "/v1/objects/"):-len("/items")])
+            root, _, path = object_id.partition("/")
+            if root not in ROOTS.values():
+                self.send(404, "{}")
+                return
+            try:
+                listing = self.sim.list([name for name in path.split("/") if name])
+            except KeyError:
+                self.send(404, "{}")
+                return
+            except SimulatedFailure:
+                self.send(500, "{}")
+                return
+            self.send(200, json.dumps({"data": [
+                {"id": f"{object_id}/{name}" if path else f"{root}/{name}",
+                 "defaultName": name, "type": REST_TYPES[type]}
+                for name, type in listing]}))
+        else:
+            self.send(404, "{}")
+
+    def do_PUT(self) -> None:
+        if urlsplit(self.path).path != PREFIX + "/v1/login":
+            self.send(404, "{}")
+            return
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        fields = {field["name"]: field["value"] for field in body["parameters"]}
+        if fields.get("CAMPassword") != PASSWORD:
+            self.send(401, "{}")
+            return
+        self.send(200, "{}", headers={"Set-Cookie": "XSRF-TOKEN=simulated; Path=/"})
+
+
+def tree_arguments(parser: argparse.ArgumentParser) -> None:
+    """The options that shape the tree and how slow it is"""
+    parser.add_argument("--depth", type=int, default=3,
+                        help="How many levels of folders under Finance")
+    parser.add_argument("--fanout", type=int, default=4,
+                        help="Subfolders in each folder")
+    parser.add_argument("--files", type=int, default=20,
+                        help="Files in each folder")
+    parser.add_argument("--latency", type=float, default=0,
+                        help="Milliseconds each folder listing takes")
+    parser.add_argument("--jitter", type=float, default=0,
+                        help="Up to this many more milliseconds, at random")
+    parser.add_argument("--capacity", type=int, default=0,
+                        help="Slow down when listing more folders than this at"
+                             " once. 0 never does")
+    parser.add_argument("--failures", type=float, default=0,
+                        help="Fail this fraction of folder listings, at random")
+    parser.add_argument("--broken", action="append", default=[], metavar="PATH",
+                        help="Always fail to list the folder at PATH, like"
+                             " \"/Finance/Folder 1/\". Can be given more than once")
+    parser.add_argument("--assets", action="store_true",
+                        help="Give the portal a stylesheet, a web font and icons")
+    parser.add_argument("--page-size", type=int, default=0,
+                        help="Load folders into the portal this many rows at a "
+                             "time, as they're scrolled to. 0 loads them whole")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a fake cognos")
+    tree_arguments(parser)
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    tree = Tree(args.depth, args.fanout, args.files)
+    sim = Simulator(tree, args.latency/1000, args.jitter/1000, port=args.port,
+                    assets=args.assets, page_size=args.page_size,
+                    capacity=args.capacity, failures=args.failures,
+                    broken=args.broken)
+    print(f"Serving {tree.nodes()} nodes ({tree.rows()} rows) at {sim.base_url}")
+    print(f"Log in with any username and the password {PASSWORD!r}")
+    try:
+        sim.server.serve_forever()
+    except KeyboardInterrupt:
+        sim.stop()
+
+
+if __name__ == "__main__":
+    main()
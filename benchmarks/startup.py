@@ -0,0 +1,86 @@
+"""
+How long does it take to get the window up? Run with
+    python -m src.benchmarks.startup [runs]
+Imports what python -m src imports before the window shows, in a fresh
+interpreter with -X importtime, and reports where the time goes.
+Then times building the window itself (offscreen, so it works without
+a display). Selenium and openpyxl shouldn't show up until a run starts.
+"""
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+# What python -m src imports before app.exec()
+STARTUP = "import src.__main__, src.gui.ui"
+# Only needed once a run starts
+HEAVY = ["selenium", "openpyxl"]
+
+WINDOW = """
+import time
+start = time.perf_counter()
+from PyQt6.QtWidgets import QApplication
+import src.gui.ui
+app = QApplication([])
+ui = src.gui.ui.Ui()
+app.processEvents()
+print(time.perf_counter() - start)
+ui.control_thread.quit()
+ui.control_thread.wait()
+"""
+
+
+def importtime(code: str) -> Dict[str, tuple[int, int]]:
+    """(self, cumulative) microseconds for every module code imports"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, check=True)
+    times: Dict[str, tuple[int, int]] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if not own.strip().isdigit():  # the header
+            continue
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def window(runs: int) -> List[float]:
+    """Seconds from a cold interpreter to a shown window, once per run"""
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    seconds = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", WINDOW], env=env,
+                                capture_output=True, text=True, check=True)
+        seconds.append(float(result.stdout.split()[-1]))
+    return seconds
+
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    times = importtime(STARTUP)
+    total = sum(own for own, _ in times.values())
+    print(f"{len(times)} modules imported in {total/1000:.0f} ms")
+
+    packages: Dict[str, int] = {}
+    for name, (own, _) in times.items():
+        packages[name.split(".")[0]] = packages.get(name.split(".")[0], 0) + own
+    print("slowest packages:")
+    for name, own in sorted(packages.items(), key=lambda kv: -kv[1])[:8]:
+        print(f"  {name:20} {own/1000:7.1f} ms")
+
+    loaded = [name for name in HEAVY if name in packages]
+    if loaded:
+        print(f"imported at startup but only needed for a run: {', '.join(loaded)}")
+
+    try:
+        seconds = sorted(window(runs))
+    except subprocess.CalledProcessError as e:
+        print("couldn't time the window:", e.stderr.strip().splitlines()[-1])
+        return
+    print(f"window shown after {seconds[len(seconds)//2]*1000:.0f} ms "
+          f"(median of {runs}, best {seconds[0]*1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+How fast does a crawl go? Run with
+    python -m src.benchmarks.traversal [--backend http] [--sessions 4] [--latency 50]
+Starts the simulator, crawls it from end to end the way the GUI's worker
+does (login, open the slider, travel to /Finance/, traverse, save), checks
+every row was found, and reports nodes per second. --record FILE appends
+the result as a json line, to keep track of regressions.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import src.driver.crawler as crawler
+from src.cli import ConsoleFilter
+from src.benchmarks.simulator import PASSWORD, Simulator, Tree, tree_arguments
+
+
+def commit() -> str:
+    """The commit being benchmarked, if it can be found"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time a crawl of the simulator")
+    tree_arguments(parser)
+    parser.add_argument("--backend", choices=["selenium", "http"], default="selenium")
+    parser.add_argument("--sessions", type=int, default=1)
+    parser.add_argument("--direct", action="store_true")
+    parser.add_argument("--fixed", action="store_true",
+                        help="Don't let the governor pace the folder reads")
+    parser.add_argument("--profile", choices=["full", "lean", "bare"], default="full")
+    parser.add_argument("--show", action="store_true",
+                        help="Show the browser instead of running headless")
+    parser.add_argument("--geckodriver", default=shutil.which("geckodriver") or "")
+    parser.add_argument("--executable", default=shutil.which("firefox") or "")
+    parser.add_argument("--runs", type=int, default=1,
+                        help="Crawl this many times back to back. Runs after "
+                             "the first reuse the first run's browsers")
+    parser.add_argument("--max-cache-age", type=float, default=0, metavar="SECONDS",
+                        help="Cache listings (in a scratch file) for runs after "
+                             "the first to reuse")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--record", metavar="FILE",
+                        help="Append the result to FILE as a json line")
+    args = parser.parse_args()
+    if args.backend == "selenium" and not (args.geckodriver and args.executable):
+        parser.error("The selenium backend needs firefox and geckodriver. "
+                     "Put them on the PATH or use --executable and --geckodriver")
+
+    tree = Tree(args.depth, args.fanout, args.files)
+    sim = Simulator(tree, args.latency/1000, args.jitter/1000,
+                    assets=args.assets, page_size=args.page_size,
+                    capacity=args.capacity, failures=args.failures,
+                    broken=args.broken)
+    logger = logging.getLogger("benchmark")
+    handler = logging.StreamHandler(sys.stderr)
+    handler.addFilter(ConsoleFilter())
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    crawl = crawler.Crawler(logger)
+    crawl.base_url = sim.start()
+    crawl.username, crawl.password = "benchmark", PASSWORD
+    crawl.travel_path = "/Finance/"
+    crawl.backend = args.backend
+    crawl.sessions = args.sessions
+    crawl.direct_nav = args.direct
+    crawl.adaptive = not args.fixed
+    crawl.headless = not args.show
+    crawl.profile = args.profile
+    crawl.geckodriver = args.geckodriver
+    crawl.executable = args.executable
+
+    crawl.max_cache_age = args.max_cache_age
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        crawl.cache_file = os.path.join(tmp, "listings.sqlite")
+        try:
+            for run in range(args.runs):
+                crawl.export_filename = os.path.join(tmp, f"benchmark{run}.xlsx")
+                ok &= crawl_once(crawl, sim, args, run)
+        finally:
+            crawl.close()
+            sim.stop()
+    sys.exit(0 if ok else 1)
+
+
+def crawl_once(crawl: crawler.Crawler, sim: Simulator,
+               args: argparse.Namespace, run: int) -> bool:
+    """Crawl the simulator once and report how it went"""
+    tree = sim.tree
+    sim.listings = 0
+    sim.failed = 0
+    start = time.perf_counter()
+    finished = crawl.run()
+    seconds = time.perf_counter() - start
+
+    counters = crawl.metrics.counters
+    traverse = crawl.metrics.histograms.get("traverse")
+    rows = counters.get("nodes", 0)
+    result = {
+        "commit": commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "backend": args.backend, "sessions": args.sessions, "direct": args.direct,
+        "profile": args.profile, "assets": args.assets,
+        "page_size": args.page_size,
+        "depth": args.depth, "fanout": args.fanout, "files": args.files,
+        "latency_ms": args.latency, "jitter_ms": args.jitter,
+        "capacity": args.capacity, "fixed": args.fixed,
+        "failures": args.failures, "broken": args.broken,
+        "max_cache_age": args.max_cache_age,
+        "run": run,
+        "finished": finished,
+        "rows": rows, "expected_rows": tree.rows(), "folders": sim.listings,
+        "nodes": tree.nodes(),
+        "seconds": seconds,
+        "traverse_seconds": traverse.sum if traverse else 0,
+        "webdriver_calls": counters.get("webdriver_calls", 0),
+        "cache_hits": counters.get("cache_hits", 0),
+        "backoffs": counters.get("backoffs", 0),
+        "failed_listings": sim.failed,
+        "quarantined": counters.get("quarantined", 0),
+    }
+    # Folders count as nodes too: they're read, just not written out
+    result["nodes_per_second"] = (tree.nodes() / result["traverse_seconds"]
+                                  if result["traverse_seconds"] else 0)
+
+    print(f"run {run}: {args.backend}, {args.sessions} session(s), "
+          f"{args.latency:.0f} ms latency: {tree.nodes()} nodes in "
+          f"{result['traverse_seconds']:.1f} s "
+          f"({result['nodes_per_second']:.0f} nodes/s, "
+          f"{seconds:.1f} s all told)")
+    if not finished or rows != tree.rows():
+        print(f"Crawl went wrong: found {rows} of {tree.rows()} rows")
+    if args.record:
+        with open(args.record, "a", encoding="utf-8") as file:
+            file.write(json.dumps(result) + "\n")
+    return finished and rows == tree.rows()
+
+if __name__ == "__main__":
+    main()
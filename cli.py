@@ -0,0 +1,446 @@
+"""
+Command line options, and running a crawl without the GUI.
+Nothing in here imports PyQt6, so --batch works on machines without a display.
+"""
+import argparse
+import getpass
+import json
+import logging
+import os
+import shlex
+import shutil
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, List
+
+import src.driver.checkpoint
+import src.driver.crawler
+from src.logs import *
+
+if TYPE_CHECKING:
+    import src.driver.shards
+
+
+def duration(text: str) -> float:
+    """Seconds in a duration like 90, 90s, 30m, 4h or 1d"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    scale = units.get(text[-1:].lower(), 1)
+    try:
+        return float(text[:-1] if text[-1:].lower() in units else text) * scale
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a duration: {text!r}")
+
+
+def init_argparse() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        usage="%(prog)s [OPTIONS]",
+        description="Walk through Cognos's directory tree"
+                    "and export the filenames to an excel file."
+    )
+    parser.add_argument(
+        "-H", "--headless", action="store_true",
+        help="Start Selenium headless (invisible)"
+    )
+    parser.add_argument(
+        "-u", "--uname",
+        help="Specify the user. This can be changed in GUI"
+    )
+    parser.add_argument(
+        "-p", "--passw",
+        help="Specify the password. This can be changed in GUI"
+    )
+    parser.add_argument(
+        "-d", "--debuglevel",
+        help="Set the logging level"
+    )
+    parser.add_argument(
+        "-P", "--profile", choices=["full", "lean", "bare"], default="full",
+        help="lean stops firefox loading images, web fonts and animations;"
+             " bare skips stylesheets too. Both are experimental, and bare may"
+             " break the waits for elements to be visible"
+    )
+    parser.add_argument(
+        "-x", "--executable",
+        help="Set the location of the firefox executable"
+    )
+    parser.add_argument(
+        "-g", "--geckodriver",
+        help="Set the location of the geckodriver executable"
+    )
+    parser.add_argument(
+        "-j", "--sessions", type=int, default=1,
+        help="Traverse with this many browsers at once"
+    )
+    parser.add_argument(
+        "-F", "--fixed", action="store_true",
+        help="Always read as many folders at once as there are browsers"
+             " (or connections), instead of fewer while cognos is slow"
+    )
+    parser.add_argument(
+        "-D", "--direct", action="store_true",
+        help="Load each folder by its pathRef link instead of clicking to it"
+    )
+    parser.add_argument(
+        "-b", "--backend", choices=["selenium", "http"], default="selenium",
+        help="List folders through Firefox or straight from Cognos's REST api"
+    )
+    parser.add_argument(
+        "-r", "--resume", metavar="CHECKPOINT",
+        help="Pick up a cancelled or crashed crawl from its checkpoint"
+    )
+    parser.add_argument(
+        "-I", "--incremental", action="store_true",
+        help="Write a diff of what changed since the last crawl. With the"
+             " http backend, folders without subfolders that haven't changed"
+             " aren't read again"
+    )
+    parser.add_argument(
+        "-c", "--max-cache-age", type=duration, default=0, metavar="AGE",
+        help="Reuse folder listings cached by earlier runs if they're no older"
+             " than AGE, in seconds or with an s, m, h or d suffix (like 30m)"
+    )
+    parser.add_argument(
+        "-s", "--stream", action="store_true",
+        help="Write rows to the excel file as they're found"
+             " instead of all at the end"
+    )
+    parser.add_argument(
+        "-o", "--output", action="append", default=[], metavar="FORMAT:FILE",
+        help="Also write the rows to FILE as csv, jsonl, parquet, sqlite or"
+             " xlsx. Can be given more than once"
+    )
+    parser.add_argument(
+        "-U", "--base-url", metavar="URL",
+        help="Crawl the cognos at URL (like https://host/ibmcognos11/bi)"
+             " instead of the usual one"
+    )
+    parser.add_argument(
+        "-M", "--metrics", metavar="FILE",
+        help="Write timings and counts for the run to FILE,"
+             " as json if it ends in .json and prometheus text otherwise"
+    )
+    parser.add_argument(
+        "-L", "--log-spill", metavar="FILE",
+        help="Append log lines too old for the GUI to keep to FILE"
+    )
+    batch = parser.add_argument_group(
+        "batch mode",
+        "Crawl from the command line without opening the GUI. "
+        "The username and password can also come from "
+        "JSPIDER_USER and JSPIDER_PASSWORD."
+    )
+    batch.add_argument(
+        "-B", "--batch", action="store_true",
+        help="Run the crawl headless and exit, without loading the GUI"
+    )
+    batch.add_argument(
+        "-t", "--start-path", default="/Finance/", metavar="PATH",
+        help="The folder to start traversing from"
+    )
+    batch.add_argument(
+        "-m", "--my-content", action="store_true",
+        help="Crawl My Content instead of Team Content"
+    )
+    batch.add_argument(
+        "-e", "--export", default="", metavar="FILE",
+        help="The excel file to write"
+    )
+    shards = parser.add_argument_group(
+        "sharding",
+        "Split a batch crawl by the start path's subfolders across several"
+        " worker processes and merge what they find into one sorted workbook."
+        " Each worker's output, manifest and log go in EXPORT.shards/, and"
+        " workers read the username and password from a file there that only"
+        " you can read, which is deleted once they're done."
+    )
+    shards.add_argument(
+        "-S", "--shards", type=int, default=0, metavar="N",
+        help="Crawl with N worker processes"
+    )
+    shards.add_argument(
+        "--split-after", type=duration, default=60, metavar="AGE",
+        help="Once workers run out of shards, split up any shard still going"
+             " after AGE (and three times as long as a typical shard)"
+    )
+    shards.add_argument(
+        "--shard-command", default="", metavar="CMD",
+        help="Start workers with CMD instead of this python, like"
+             " \"ssh host python -m src\". Workers need to see the shards"
+             " directory at the same path, since that's where they get"
+             " the login from"
+    )
+    shards.add_argument(
+        "--manifest", default="", metavar="FILE",
+        help=argparse.SUPPRESS  # Where a worker says how its crawl went
+    )
+    shards.add_argument(
+        "--stop-file", default="", metavar="FILE",
+        help=argparse.SUPPRESS  # A worker stops, checkpointed, once this exists
+    )
+    shards.add_argument(
+        "--credentials", default="", metavar="FILE",
+        help=argparse.SUPPRESS  # Where a worker gets the username and password
+    )
+    return parser
+
+
+def configure(crawler: src.driver.crawler.Crawler,
+              args: argparse.Namespace) -> None:
+    """Apply the crawl settings from the command line to a crawler"""
+    crawler.headless = args.headless
+
+    if args.profile != "full":
+        crawler.profile = args.profile
+        JSpider.info("Using the %s browser profile", args.profile)
+
+    if args.sessions > 1:
+        crawler.sessions = args.sessions
+        JSpider.info("Traversing with %d browsers", args.sessions)
+
+    if args.fixed:
+        crawler.adaptive = False
+        JSpider.info("Not pacing folder reads to how cognos is coping")
+
+    if args.base_url:
+        crawler.base_url = args.base_url
+        JSpider.info("Crawling the cognos at %s", args.base_url)
+
+    if args.direct:
+        crawler.direct_nav = True
+        JSpider.info("Loading folders by pathRef")
+
+    if args.backend != "selenium":
+        crawler.backend = args.backend
+        JSpider.info("Listing folders with the %s backend", args.backend)
+
+    if args.resume:
+        settings = src.driver.checkpoint.Checkpoint.peek(args.resume)
+        crawler.travel_path = settings["TravelPath"]
+        crawler.team_content = settings["TeamContent"]
+        crawler.resume = args.resume
+        JSpider.info("Resuming the crawl of %s from %s",
+                     settings["TravelPath"], args.resume)
+
+    if args.incremental:
+        crawler.incremental = True
+        JSpider.info("Only re-reading folders that changed")
+
+    if args.max_cache_age:
+        crawler.max_cache_age = args.max_cache_age
+        JSpider.info("Reusing cached folder listings up to %.0f seconds old",
+                     args.max_cache_age)
+
+    if args.stream:
+        crawler.streaming = True
+        JSpider.info("Streaming rows to the excel file")
+
+    if args.output:
+        crawler.outputs = args.output
+        JSpider.info("Also writing to %s", ", ".join(args.output))
+
+    if args.metrics:
+        crawler.metrics_file = args.metrics
+        JSpider.info("Writing metrics to %s", args.metrics)
+
+    if args.debuglevel:
+        JSpider.setLevel(int(args.debuglevel))
+        JSpider_worker.setLevel(int(args.debuglevel))
+        JSpider.critical(
+            "Debug level set from command line: %s", args.debuglevel)
+
+
+def find_executable(args: argparse.Namespace) -> str:
+    """Find firefox, or "" if the backend doesn't need it"""
+    if args.executable:
+        return args.executable
+    if args.backend != "selenium":  # the http backend doesn't need firefox
+        return ""
+    for name in ("firefox.exe", "firefox"):
+        if tmp:=shutil.which(name):  # try to find firefox with shutil
+            return tmp
+    JSpider.critical("Could not find a valid firefox distro.")
+    sys.exit(1)
+
+
+def find_geckodriver(args: argparse.Namespace) -> str:
+    """Find geckodriver, preferring the included package"""
+    if args.geckodriver:
+        return args.geckodriver
+    # by default assume that we're using the included geckodriver package
+    if os.path.exists("./binaries/geckodriver.exe") or os.name == "nt":
+        return "./binaries/geckodriver.exe"
+    return shutil.which("geckodriver") or "geckodriver"
+
+
+class ConsoleFilter(logging.Filter):
+    """Drop the records the GUI turns into counters and progress bars"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno not in (PROGRESSBAR, NODESQUEUED, NODESFINISHED)
+
+
+def run(args: argparse.Namespace) -> int:
+    """Run one crawl from the command line. Returns the exit status."""
+    crawler = src.driver.crawler.Crawler(JSpider_worker)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(levelname)s:%(message)s"))
+    handler.addFilter(ConsoleFilter())
+    JSpider_worker.addHandler(handler)
+    JSpider_worker.setLevel(logging.INFO)
+
+    crawler.travel_path = args.start_path
+    crawler.team_content = not args.my_content
+    configure(crawler, args)
+    crawler.headless = True  # There's nobody to look at the browser
+
+    if not args.export:
+        JSpider.critical("Batch mode needs a file to write. Use --export")
+        return 2
+    crawler.export_filename = args.export
+    if args.credentials:
+        with open(args.credentials, encoding="utf-8") as file:
+            credentials = json.load(file)
+        args.uname = args.uname or credentials["username"]
+        args.passw = args.passw or credentials["password"]
+    crawler.username = (args.uname or os.environ.get("JSPIDER_USER")
+                        or input("Username: "))
+    crawler.password = (args.passw or os.environ.get("JSPIDER_PASSWORD")
+                        or getpass.getpass("Password: "))
+    crawler.executable = find_executable(args)
+    crawler.geckodriver = find_geckodriver(args)
+
+    if args.shards:
+        if args.resume:
+            JSpider.critical("A sharded crawl can't be resumed. Run it again")
+            return 2
+        return run_sharded(args, crawler)
+    if args.stop_file:
+        threading.Thread(target=watch_stop_file, args=(args.stop_file, crawler),
+                         daemon=True).start()
+
+    JSpider.debug("Batch crawl started")
+    started = time.time()
+    try:
+        finished = crawler.run()
+    finally:
+        crawler.close()
+    JSpider.debug("Batch crawl %s", "finished" if finished else "stopped early")
+    if args.manifest:
+        write_manifest(args.manifest, crawler, finished, time.time() - started)
+    return 0 if finished else 1
+
+
+def watch_stop_file(filename: str, crawler: src.driver.crawler.Crawler) -> None:
+    """Cancel the crawl once filename exists. Its checkpoint is kept."""
+    while not os.path.exists(filename):
+        time.sleep(1)
+    JSpider.warning("Stopping, since %s exists", filename)
+    crawler.control.cancel()
+
+
+def write_manifest(filename: str, crawler: src.driver.crawler.Crawler,
+                   finished: bool, seconds: float) -> None:
+    """Say how a worker's crawl went, for the coordinator"""
+    checkpoint = crawler.export_filename + ".checkpoint"
+    manifest = {"travel_path": crawler.travel_path,
+                "team_content": crawler.team_content,
+                "finished": finished,
+                "rows": crawler.metrics.counters.get("nodes", 0),
+                "seconds": seconds,
+                "export": crawler.export_filename,
+                "outputs": crawler.outputs,
+                "checkpoint": checkpoint if os.path.exists(checkpoint) else ""}
+    with open(filename + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(filename + ".tmp", filename)
+
+
+def shard_command(args: argparse.Namespace,
+                  shard: "src.driver.shards.Shard") -> List[str]:
+    """The command line of a worker crawling one shard with this crawl's settings"""
+    command = (shlex.split(args.shard_command) if args.shard_command
+               else [sys.executable, "-m", "src"])
+    command += ["--batch", "-t", shard.travel_path, "-e", shard.export,
+                "-o", "jsonl:" + shard.output, "--manifest", shard.manifest,
+                "--stop-file", shard.stop_file,
+                "--credentials", credentials_file(args),
+                "-P", args.profile, "-j", str(args.sessions), "-b", args.backend]
+    for flag, value in (("-x", args.executable), ("-g", args.geckodriver),
+                        ("-U", args.base_url), ("-d", args.debuglevel),
+                        ("-r", shard.resume)):
+        if value:
+            command += [flag, value]
+    for flag, value in (("-D", args.direct), ("-m", args.my_content),
+                        ("-s", args.stream), ("-F", args.fixed)):
+        if value:
+            command.append(flag)
+    if args.max_cache_age:
+        command += ["-c", str(args.max_cache_age)]
+    return command
+
+
+def credentials_file(args: argparse.Namespace) -> str:
+    """Where a sharded crawl leaves the login for its workers"""
+    return os.path.join(args.export + ".shards", "credentials.json")
+
+
+def write_credentials(filename: str, username: str, password: str) -> None:
+    """Write a login only this user can read"""
+    if os.path.exists(filename):
+        os.remove(filename)
+    descriptor = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with open(descriptor, "w", encoding="utf-8") as file:
+        json.dump({"username": username, "password": password}, file)
+
+
+def run_sharded(args: argparse.Namespace,
+                crawler: src.driver.crawler.Crawler) -> int:
+    """
+    List the start path, crawl each of its subfolders in a worker process,
+    and merge the rows into the export. Returns the exit status.
+    """
+    import src.driver.excelwriter as excelwriter
+    import src.driver.shards as shards
+    import src.driver.sinks as sinks
+
+    directory = args.export + ".shards"
+    try:
+        rows, folders = crawler.survey()
+    finally:
+        crawler.close()
+    JSpider.info("Splitting %s into %d shards over %d workers",
+                 crawler.travel_path, len(folders), args.shards)
+
+    coordinator = shards.Coordinator(
+        JSpider_worker, lambda shard: shard_command(args, shard), args.shards,
+        directory, split_after=args.split_after)
+    # The start path's own rows don't need a worker
+    root = sinks.JsonlSink(os.path.join(directory, "root.jsonl"))
+    for row in rows:
+        root.append(row)
+    root.finalize()
+    for folder in folders:
+        coordinator.add(folder.linkpath or "")
+    started = time.time()
+    # Environment variables don't make it through --shard-command's ssh
+    write_credentials(credentials_file(args), crawler.username, crawler.password)
+    try:
+        finished = coordinator.run()
+    finally:
+        os.remove(credentials_file(args))
+
+    JSpider.info("Merging shards into %s", args.export)
+    export = (excelwriter.StreamingExcelWriter(args.export) if args.stream
+              else excelwriter.ExcelWriter(args.export))
+    total = shards.merge([root.filename] + coordinator.outputs(), sinks.MultiSink(
+        [export] + [sinks.make_sink(spec) for spec in args.output]))
+    coordinator.write_manifest(args.export + ".manifest.json", {
+        "travel_path": crawler.travel_path,
+        "team_content": crawler.team_content,
+        "finished": finished, "rows": total, "seconds": time.time() - started})
+    JSpider.info("Wrote %d rows from %d shards", total, len(coordinator.shards))
+    if not finished:
+        JSpider.error("Some shards failed, so %s is missing rows. See %s",
+                      args.export, args.export + ".manifest.json")
+    return 0 if finished else 1
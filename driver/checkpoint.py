@@ -0,0 +1,103 @@
+"""
+Save a crawl's progress as it goes so it can be resumed after a crash or cancel.
+"""
+import json
+import os
+import time
+from typing import IO, List
+
+from src.driver.folderelem import FolderElem
+
+
+class Checkpoint():
+    """
+    A checkpoint is two files next to each other:
+      - <filename>       the folders left to read, the crawl settings
+                         and how many rows were committed with them
+      - <filename>.rows  every row collected so far, one json list per line
+    Rows are appended as they arrive. The state file is only rewritten at
+    folder boundaries, so on resume any rows past the committed count
+    belong to a half-read folder and are thrown away.
+    """
+
+    def __init__(self, filename: str, interval: float = 30):
+        self.filename = filename
+        self.rows_filename = filename + ".rows"
+        self.interval = interval  # seconds between saves
+        self.settings: dict = {}
+        self.frontier: List[List[str]] = []
+        self.rows_written = 0
+        self.committed = 0
+        self.__last_save = time.monotonic()
+        self.__rows: IO[str]
+
+    @staticmethod
+    def peek(filename: str) -> dict:
+        """The settings a checkpoint was started with"""
+        with open(filename, encoding="utf-8") as file:
+            return json.load(file)["settings"]
+
+    def start(self, settings: dict, frontier: List[List[str]]) -> None:
+        """Start a fresh checkpoint for a new crawl"""
+        self.settings = settings
+        self.frontier = [list(path) for path in frontier]
+        self.__rows = open(self.rows_filename, "w", encoding="utf-8")
+        self.save()
+
+    def resume(self) -> List[FolderElem]:
+        """Load an existing checkpoint. Returns the rows it had committed."""
+        with open(self.filename, encoding="utf-8") as file:
+            state = json.load(file)
+        self.settings = state["settings"]
+        self.frontier = state["frontier"]
+        self.committed = self.rows_written = state["rows"]
+
+        rows: List[FolderElem] = []
+        with open(self.rows_filename, "r+", encoding="utf-8") as file:
+            for _ in range(self.committed):
+                type, name, path, link = json.loads(file.readline())
+                rows.append(FolderElem(FolderElem.ElemType[type],
+                                       name, path, link))
+            file.truncate(file.tell())
+        self.__rows = open(self.rows_filename, "a", encoding="utf-8")
+        return rows
+
+    def append(self, elem: FolderElem) -> None:
+        """Record a row"""
+        self.__rows.write(json.dumps([elem.type.name, elem.name,
+                                      elem.path, elem.link]) + "\n")
+        self.rows_written += 1
+
+    def folder_done(self, frontier: List[List[str]]) -> None:
+        """
+        Note that every row so far belongs to a finished folder.
+        Saves if it has been a while since the last save.
+        """
+        self.frontier = [list(path) for path in frontier]
+        self.committed = self.rows_written
+        if time.monotonic() - self.__last_save >= self.interval:
+            self.save()
+
+    def save(self) -> None:
+        """Write the last consistent state to disk"""
+        self.__rows.flush()
+        os.fsync(self.__rows.fileno())
+        tmp = self.filename + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump({"settings": self.settings,
+                       "frontier": self.frontier,
+                       "rows": self.committed}, file)
+        os.replace(tmp, self.filename)
+        self.__last_save = time.monotonic()
+
+    def close(self) -> None:
+        """Save one last time and close the rows file"""
+        self.save()
+        self.__rows.close()
+
+    def remove(self) -> None:
+        """The crawl finished. Throw the checkpoint away."""
+        self.__rows.close()
+        for filename in [self.filename, self.rows_filename]:
+            if os.path.exists(filename):
+                os.remove(filename)
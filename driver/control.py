@@ -0,0 +1,135 @@
+"""
+Pausing and cancelling a crawl from another thread.
+"""
+import threading
+import time
+from typing import Callable, Dict, List
+
+from src.driver.metrics import Metrics
+from src.exceptions import EarlyLeaveException
+
+IDLE = "idle"  # No crawl running
+RUNNING = "running"
+PAUSED = "paused"
+CANCELLED = "cancelled"
+
+# Which request each state acknowledges
+REQUESTS = {RUNNING: "resume", PAUSED: "pause", CANCELLED: "cancel"}
+
+
+class ControlChannel():
+    """
+    How the GUI steers a crawl running on another thread. The controller
+    calls pause(), unpause() and cancel(), which return right away.
+    The crawl calls check() before every WebDriver command and http
+    request (and between rows), which blocks while paused and raises
+    EarlyLeaveException once cancelled. The first check() after a request
+    acknowledges it, so wait_acknowledged() returns as soon as the crawl
+    has actually stopped or started again. How long that took is
+    observed as control.pause, control.resume and control.cancel.
+    """
+
+    def __init__(self, metrics: Metrics | None = None):
+        self.metrics = metrics
+        self.__state = IDLE
+        self.__cond = threading.Condition()
+        # When each request not yet acknowledged was made
+        self.__pending: Dict[str, float] = {}
+        self.__listeners: List[Callable[[str], None]] = []
+        self.__finished = threading.Event()
+        self.__finished.set()
+
+    @property
+    def state(self) -> str:
+        return self.__state
+
+    def listen(self, listener: Callable[[str], None]) -> Callable[[], None]:
+        """
+        Call listener with the new state whenever it changes, on whichever
+        thread changed it. Returns a function that stops listening.
+        """
+        with self.__cond:
+            self.__listeners.append(listener)
+        return lambda: self.__listeners.remove(listener)
+
+    def __change(self, state: str) -> None:
+        """Move to state and wake everyone up. Call with the lock held."""
+        self.__state = state
+        self.__cond.notify_all()
+        for listener in list(self.__listeners):
+            listener(state)
+
+    def start(self) -> None:
+        """
+        A crawl is starting. Requests made before this (say, cancelling
+        while the browser was being set up) still count.
+        """
+        with self.__cond:
+            self.__finished.clear()
+            if self.__state == IDLE:
+                self.__change(RUNNING)
+
+    def finish(self) -> None:
+        """The crawl is over. Nothing is waiting for check() any more."""
+        with self.__cond:
+            self.__pending.clear()
+            self.__change(IDLE)
+            self.__finished.set()
+
+    def pause(self) -> None:
+        with self.__cond:
+            if self.__state in (RUNNING, IDLE):
+                self.__pending.pop("resume", None)
+                self.__pending["pause"] = time.perf_counter()
+                self.__change(PAUSED)
+
+    def unpause(self) -> None:
+        with self.__cond:
+            if self.__state == PAUSED:
+                self.__pending.pop("pause", None)
+                self.__pending["resume"] = time.perf_counter()
+                self.__change(RUNNING)
+
+    def cancel(self) -> None:
+        with self.__cond:
+            if self.__state != CANCELLED:
+                self.__pending.clear()
+                self.__pending["cancel"] = time.perf_counter()
+                self.__change(CANCELLED)
+
+    def __acknowledge(self) -> None:
+        """Acknowledge the request the current state answers. Call with the lock held."""
+        request = REQUESTS.get(self.__state)
+        if request in self.__pending:
+            latency = time.perf_counter() - self.__pending.pop(request)
+            if self.metrics is not None:
+                self.metrics.observe("control." + request, latency)
+            self.__cond.notify_all()
+
+    def check(self, block: bool = True) -> bool:
+        """
+        Somewhere safe to pause or cancel. Raises EarlyLeaveException if
+        cancelled. When paused, waits to be unpaused, or with block=False
+        returns True straight away instead.
+        """
+        if self.__state == RUNNING and not self.__pending:
+            return False  # The usual case, without taking the lock
+        with self.__cond:
+            self.__acknowledge()
+            while self.__state == PAUSED and block:
+                self.__cond.wait()
+                self.__acknowledge()
+            if self.__state == CANCELLED:
+                raise EarlyLeaveException
+            return self.__state == PAUSED
+
+    def wait_acknowledged(self, request: str, timeout: float | None = None) -> bool:
+        """Wait until the crawl has acted on a pause, resume or cancel"""
+        with self.__cond:
+            return self.__cond.wait_for(
+                lambda: request not in self.__pending or self.__finished.is_set(),
+                timeout)
+
+    def wait_finished(self, timeout: float | None = None) -> bool:
+        """Wait until the crawl is over"""
+        return self.__finished.wait(timeout)
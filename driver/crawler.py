@@ -0,0 +1,445 @@
+"""
+Run a whole crawl: log in, traverse, and write the output.
+Nothing in here knows about the GUI, so it can run from the command line too.
+"""
+from typing import TYPE_CHECKING, List
+import os
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.exceptions import *
+from src.driver import folderelem
+from src.logs import *
+import src.driver.sinks as sinks
+import src.driver.traversal as traversal
+from src.driver import readiness
+import src.driver.checkpoint as checkpoint
+import src.driver.control as control
+import src.driver.governor as governor
+import src.driver.listingcache as listingcache
+import src.driver.listingindex as listingindex
+import src.driver.metrics as metrics
+import src.driver.sessionpool as sessionpool
+
+# Selenium and openpyxl take most of a second to import, so they wait
+# until a run needs them. Nothing the GUI shows at startup does.
+if TYPE_CHECKING:
+    import src.driver.httpdriver as httpdriver
+    import src.driver.seleniumdriver as sd
+
+
+class Crawler():
+    """Traverse Cognos and prepare a file for saving"""
+
+    def __init__(self, logger: logging.Logger) -> None:
+        self.logger = logger
+
+        # What to crawl, and where to put it
+        self.username = ""
+        self.password = ""
+        self.team_content = True  # Team Content (true) or My Content (false)
+        self.travel_path = "/"  # The path to travel before starting traversal
+        self.export_filename = ""
+
+        # How to crawl it
+        self.base_url = ""  # Where cognos is, if not the usual place
+        self.geckodriver = ""
+        self.executable = ""
+        self.headless = False
+        self.profile = "full"  # How much of cognos firefox loads: full, lean or bare
+        self.sessions = 1  # How many browsers to traverse with
+        self.adaptive = True  # Read fewer folders at once when cognos struggles
+        self.direct_nav = False  # Load folders by pathRef
+        self.backend = "selenium"  # or "http" to skip the browser
+        self.resume = ""  # Checkpoint file to pick a crawl back up from
+        self.incremental = False  # Diff against the last run, skipping what can be
+        self.max_cache_age = 0.0  # Reuse listings up to this many seconds old. 0 for none.
+        self.cache_file = listingcache.CACHE_FILE
+        self.streaming = False  # Write rows to the workbook as they arrive
+        self.outputs: List[str] = []  # Extra sinks, as FORMAT:FILENAME
+        self.metrics_file = ""  # Where to write the run's metrics, if anywhere
+
+        # Held while drivers are being made, so they can't be quit half made
+        self.setupLock = threading.Lock()
+        # Logged in browsers left over from earlier runs. None to not keep any.
+        self.pool: sessionpool.SessionPool | None = sessionpool.SessionPool(logger)
+
+        # For typing reasons, driver is a SeleniumDriver (or HttpDriver)
+        self.driver: "sd.SeleniumDriver | httpdriver.HttpDriver"
+        # Any extra browsers used by a parallel traversal
+        self.extra_drivers: List["sd.SeleniumDriver"] = []
+        self.checkpoint: checkpoint.Checkpoint | None = None
+        self.metrics = metrics.Metrics()
+        # How another thread pauses or cancels the crawl
+        self.control = control.ControlChannel()
+        # Paces the folder reads, if adaptive
+        self.governor: governor.Governor | None = None
+
+    def run(self) -> bool:
+        """
+        Run the actual process and save the file afterwards.
+        Returns whether the crawl made it all the way through.
+        """
+        # If there's no uname/passw, this is a dead run.
+        if self.username == "" or self.password == "":
+            self.logger.error("Username and password cannot be blank")
+            return False
+
+        self.direction = "Team Content" if self.team_content else "My Content"
+        # Only the selenium backend can raise these
+        driver_errors: tuple[type[Exception], ...] = ()
+        # What a folder read that's worth trying again fails with
+        read_errors = traversal.READ_ERRORS
+        if self.backend == "selenium":
+            from selenium.common.exceptions import (
+                ElementClickInterceptedException, NoSuchElementException,
+                WebDriverException)
+            driver_errors = (NoSuchElementException,
+                             ElementClickInterceptedException)
+            read_errors += (WebDriverException,)
+            from src.driver.seleniumdriver import EXPERIMENTAL_PROFILES
+            if self.profile in EXPERIMENTAL_PROFILES:
+                self.logger.warning("The %s profile is experimental. Use the full"
+                                    " profile if folders don't load", self.profile)
+        import src.driver.excelwriter as excelwriter
+        # The GUI runs crawl after crawl in one process. Only this one's paths matter.
+        folderelem.FolderElem.forget_paths()
+        self.metrics = metrics.Metrics()
+        self.control.metrics = self.metrics
+        self.control.start()
+        self.governor = self.__new_governor()
+
+        self.logger.log(LOCK, "setuplock locking")
+        self.setupLock.acquire()
+        self.driver, warm = self.__get_driver()
+        self.extra_drivers = []
+
+        self.setupLock.release()
+        self.logger.log(LOCK, "setupLock unlocked")
+
+        finished = False
+        try:
+            self.__ready(self.driver, warm)
+            self.driver.travel_path(self.travel_path)
+
+            self.logger.info(
+                "%s is queued and ready. Initializing excel file",
+                self.backend.capitalize())
+            if self.streaming:
+                self.excel_file = excelwriter.StreamingExcelWriter(
+                    self.export_filename)
+            else:
+                self.excel_file = excelwriter.ExcelWriter(self.export_filename)
+            self.output = sinks.MultiSink(
+                [self.excel_file] + [sinks.make_sink(spec) for spec in self.outputs])
+            if self.backend == "selenium":
+                self.driver.enableScrollToBottom()
+            resumed = bool(self.resume)
+            frontier = self.__start_checkpoint()
+            index = None
+            if self.incremental:
+                index = listingindex.ListingIndex(
+                    self.export_filename + ".index.json")
+            self.logger.debug("Traversing")
+            traverse_started = time.perf_counter()
+            cache = None
+            traverser = None
+            try:
+                if self.backend == "http":
+                    # One driver, but it can list on every pooled connection
+                    listers = [self.driver]*self.driver.pool_size
+                elif self.sessions > 1:
+                    listers = [self.driver]+self.__start_sessions()
+                else:
+                    listers = [self.driver]
+                if self.governor is not None:
+                    listers = [governor.GovernedLister(lister, self.governor)
+                               for lister in listers]
+                if self.max_cache_age:
+                    cache = listingcache.ListingCache(self.cache_file,
+                                                      self.max_cache_age)
+                    listers = [listingcache.CachedLister(lister, cache,
+                                                         self.__content_root(),
+                                                         self.metrics)
+                               for lister in listers]
+                if index:
+                    listers = [listingindex.IncrementalLister(lister, index)
+                               for lister in listers]
+                traverser = traversal.AsyncTraverser(
+                    self.logger, listers, frontier, self.control,
+                    self.checkpoint.folder_done, index,
+                    read_errors=read_errors)
+                traverser.run(self.__record)
+                # Keep the checkpoint of a crawl with folders left out,
+                # so resuming it tries just those again
+                if not traverser.quarantine:
+                    self.checkpoint.remove()
+                    finished = True
+                    # An earlier run's report of what it skipped is out of date
+                    if os.path.exists(self.export_filename + ".errors.csv"):
+                        os.remove(self.export_filename + ".errors.csv")
+                    if index:
+                        self.__finish_index(index, resumed)
+            except EarlyLeaveException:
+                self.driver.quit()
+            finally:
+                if traverser is not None and traverser.quarantine:
+                    self.__report_quarantine(traverser)
+                if cache is not None:
+                    self.logger.info("Took %d of %d folder listings from the cache",
+                                     cache.hits, cache.hits + cache.misses)
+                    cache.close()
+                if self.governor is not None:
+                    self.logger.info("Folder reads at once ended at %d of %d",
+                                     self.governor.limit, self.governor.maximum)
+            self.metrics.observe("traverse", time.perf_counter() - traverse_started)
+            waits = readiness.WaitStats()
+            for driver in [self.driver]+self.extra_drivers:
+                if hasattr(driver, "waits"):
+                    waits.merge(driver.waits)
+            for line in waits.summary():
+                self.logger.info("Waited for %s", line)
+            self.logger.info("Saving")
+            with self.metrics.timer("save"):
+                self.output.finalize()
+            self.logger.log(NODESFINISHED, 0)
+            self.logger.log(NODESQUEUED, 0)
+            self.logger.log(PROGRESSBAR, 0)
+            self.logger.info("Run finished")
+        # No guarantee that self.driver exists. If it doesn't, that's OK
+        except AttributeError:
+            self.logger.debug("Error: Couldn't find driver")
+        # Helps us cancel the program in a happy way
+        except EarlyLeaveException:
+            pass #Fail out of the run loop quietly. 
+                 #This is an expected condition, and doesn't need to be handled
+        except LoginException:
+            self.logger.error("Closing driver.")
+            pass #Notification is handled in seleniumdriver
+                 # and cleanup is handled in finally clause
+        except driver_errors:
+            #Looks like something went wrong with the driver. 
+            self.logger.error("Something went wrong with the driver. Please check logs.")
+        except StateException as e:
+            self.logger.error("Stopping the crawl: %s", e)
+
+        finally:
+            self.__close_checkpoint()
+            self.__close_output()
+            for driver in [self.driver]+self.extra_drivers:
+                self.__dismiss(driver)
+            self.__report_metrics()
+            # Only now is everything closed, so whoever cancelled can carry on
+            self.control.finish()
+        return finished
+
+    def survey(self) -> tuple[List[folderelem.FolderElem], List[folderelem.FolderElem]]:
+        """
+        List just the travel path: its rows, and the folders under it.
+        For splitting a crawl up before running it.
+        """
+        self.direction = "Team Content" if self.team_content else "My Content"
+        self.metrics = metrics.Metrics()
+        self.control.metrics = self.metrics
+        self.control.start()
+        self.governor = self.__new_governor()
+        driver, warm = self.__get_driver()
+        try:
+            self.__ready(driver, warm)
+            driver.travel_path(self.travel_path)
+            return driver.list_folder(list(driver.path))
+        finally:
+            self.__dismiss(driver)
+            self.control.finish()
+
+    def __new_governor(self) -> governor.Governor | None:
+        """A governor for as many folder reads at once as the crawl can do, if adaptive"""
+        if not self.adaptive:
+            return None
+        # What cognos does when it's too busy
+        backoff_on: tuple[type[Exception], ...] = (TimeoutError,)
+        if self.backend == "selenium":
+            from selenium.common.exceptions import (
+                ElementClickInterceptedException, TimeoutException)
+            backoff_on += (TimeoutException, ElementClickInterceptedException)
+            maximum = self.sessions
+        else:
+            import src.driver.httpdriver as httpdriver
+            maximum = httpdriver.POOL_SIZE
+        return governor.Governor(self.logger, maximum, backoff_on=backoff_on,
+                                 metrics=self.metrics, control=self.control)
+
+    def __ready(self, driver: "sd.SeleniumDriver | httpdriver.HttpDriver",
+                warm: bool) -> None:
+        """
+        Get a driver to the top of the content, paced and retried by the
+        governor if there is one: every browser logging in at once is
+        what cognos struggles with most.
+        """
+        driver.governor = self.governor
+        if self.governor is None:
+            self.__log_in(driver, warm)
+        else:
+            self.governor.call(self.__log_in, driver, warm)
+
+    def __log_in(self, driver: "sd.SeleniumDriver | httpdriver.HttpDriver",
+                 warm: bool) -> None:
+        """Log a driver in (unless it's warm) and get it to the top of the content"""
+        if warm:
+            driver.reset(self.direction)
+            return
+        driver.login(self.username, self.password)
+        if self.backend == "selenium":
+            driver.open_slider()
+
+    def __record(self, element: folderelem.FolderElem) -> None:
+        """Write out a row the traversal found"""
+        self.output.append(element)
+        self.checkpoint.append(element)
+        self.metrics.count("nodes")
+
+    def __report_metrics(self) -> None:
+        """Log where the run's time went, and write it out if asked to"""
+        for line in self.metrics.summary():
+            self.logger.info("Metrics: %s", line)
+        if self.metrics_file:
+            self.metrics.write(self.metrics_file)
+            self.logger.info("Metrics written to %s", self.metrics_file)
+
+    def __start_checkpoint(self) -> List[List[str]]:
+        """
+        Start checkpointing, or pick up from self.resume.
+        Returns the folders left to traverse.
+        """
+        if self.resume:
+            self.checkpoint = checkpoint.Checkpoint(self.resume)
+            self.resume = ""  # Only once. The next run starts fresh.
+            for element in self.checkpoint.resume():
+                self.output.append(element)
+            self.logger.info("Resuming with %d rows read and %d folders left",
+                                self.checkpoint.committed,
+                                len(self.checkpoint.frontier))
+            return self.checkpoint.frontier
+
+        self.checkpoint = checkpoint.Checkpoint(
+            self.export_filename + ".checkpoint")
+        frontier = [list(self.driver.path)]
+        self.checkpoint.start({"TravelPath": self.travel_path,
+                               "TeamContent": self.team_content}, frontier)
+        return frontier
+
+    def __close_checkpoint(self) -> None:
+        """Save the checkpoint of a crawl that didn't finish"""
+        if getattr(self, "checkpoint", None) is None:
+            return
+        if os.path.exists(self.checkpoint.filename):
+            self.checkpoint.close()
+            self.logger.warning("Progress saved. Resume with --resume \"%s\"",
+                                   self.checkpoint.filename)
+        self.checkpoint = None
+
+    def __finish_index(self, index: listingindex.ListingIndex,
+                       resumed: bool) -> None:
+        """Save the listing index of a finished crawl and report what changed"""
+        self.logger.info("%d folder listings unchanged, %d of them not read again",
+                         len(index.same), index.skipped)
+        if resumed:
+            # Folders read before the checkpoint aren't in the new index
+            self.logger.warning("Not updating the listing index of a resumed crawl")
+            return
+        changes = index.write_diff(self.export_filename + ".diff.csv")
+        index.save()
+        self.logger.info("%d rows changed since the last crawl", changes)
+
+    def __report_quarantine(self, traverser: traversal.AsyncTraverser) -> None:
+        """Say which folders were left out of the crawl"""
+        filename = self.export_filename + ".errors.csv"
+        skipped = traverser.write_quarantine(filename)
+        self.logger.error("Skipped %d folders that couldn't be read. See %s",
+                          skipped, filename)
+        self.metrics.count("quarantined", skipped)
+
+    def __close_output(self) -> None:
+        """Save whatever the run got before it failed"""
+        output = getattr(self, "output", None)
+        if output is not None and not output.closed:
+            output.finalize()
+            self.logger.warning("Saved partial output with %d rows",
+                                   output.rows)
+
+    def __new_driver(self) -> "sd.SeleniumDriver | httpdriver.HttpDriver":
+        """Make a driver with the crawl's settings"""
+        if self.backend == "http":
+            import src.driver.httpdriver as httpdriver
+            return httpdriver.HttpDriver(self.logger, self.base_url,
+                                         my_loc=self.direction,
+                                         metrics=self.metrics,
+                                         control=self.control)
+        import src.driver.seleniumdriver as sd
+        return sd.SeleniumDriver(self.logger,
+                                 self.geckodriver,
+                                 self.executable,
+                                 self.headless,
+                                 self.direction,
+                                 self.direct_nav,
+                                 self.metrics,
+                                 self.base_url,
+                                 self.profile,
+                                 self.control)
+
+    def __content_root(self) -> str:
+        """What the listing cache files this crawl's folders under"""
+        root = f"{self.driver.base_url}|{self.direction}"
+        if not self.team_content:  # Everyone's My Content is different
+            root += f"|{self.username}"
+        return root
+
+    def __session_key(self) -> tuple:
+        """What a pooled browser has to have in common with this run to be reused"""
+        return (self.geckodriver, self.executable, self.headless,
+                self.profile, self.base_url, self.username)
+
+    def __get_driver(self) -> tuple["sd.SeleniumDriver | httpdriver.HttpDriver", bool]:
+        """A driver for this run, and whether it's a warm one from the pool"""
+        if self.pool is not None and self.backend == "selenium":
+            driver = self.pool.acquire(self.__session_key())
+            if driver is not None:
+                driver.direct_nav = self.direct_nav
+                driver.metrics = self.metrics
+                driver.control = self.control
+                return driver, True
+        return self.__new_driver(), False
+
+    def __dismiss(self, driver: "sd.SeleniumDriver | httpdriver.HttpDriver") -> None:
+        """Done with a driver: put it back in the pool, or quit it"""
+        if self.pool is not None and self.backend == "selenium":
+            self.pool.release(self.__session_key(), driver)
+        else:
+            driver.quit()
+
+    def close(self) -> None:
+        """Quit the browsers kept for later runs"""
+        if self.pool is not None:
+            self.pool.close()
+
+    def __start_session(self) -> "sd.SeleniumDriver":
+        """Start an extra browser (or reuse one) and get it to the top of the slider"""
+        self.logger.log(LOCK, "setuplock locking")
+        self.setupLock.acquire()
+        driver, warm = self.__get_driver()
+        self.extra_drivers.append(driver)
+        self.setupLock.release()
+        self.logger.log(LOCK, "setupLock unlocked")
+
+        self.__ready(driver, warm)
+        if not warm:
+            driver.enableScrollToBottom()
+        return driver
+
+    def __start_sessions(self) -> List["sd.SeleniumDriver"]:
+        """Start the extra browsers for a parallel traversal"""
+        self.logger.info("Starting %d extra browsers", self.sessions-1)
+        with ThreadPoolExecutor(self.sessions-1) as pool:
+            return list(pool.map(lambda _: self.__start_session(),
+                                 range(self.sessions-1)))
@@ -1,39 +1,95 @@
 """
 Utility functions to create an excel function from the output
 """
+import os
 import openpyxl
 from datetime import date
 
 from src.driver.folderelem import FolderElem
+from src.driver.sinks import Sink, HEADERS
 from src.logs import *
 
-class ExcelWriter():
+class ExcelWriter(Sink):
     """Take in folder_elems and write them to an excel file."""
-    def __init__(self):
+    headers = HEADERS
+
+    def __init__(self, filename: str = ""):
+        super().__init__(filename)
         self._internal_array:list[FolderElem] = []
     def append(self,listing:FolderElem)->None:
         self._internal_array.append(listing)
-    
+        self.rows += 1
+
     def write_wb(self,filename: str)->None:
         """Write the workbook to filename. """
         #This lets us defer excel ops until the end.
-        headers = ["Path","File","Type","Description","Link"]
-        
+        ws = self._start_wb()
+        for elem in self._internal_array:
+            ws.append(self._row(ws, elem))
+        self.wb.save(filename)
+        self.closed = True
+
+    def finalize(self) -> None:
+        self.write_wb(self.filename)
+
+    def _start_wb(self):
+        """Make a write-only workbook and write the header rows"""
         self.wb = openpyxl.Workbook(write_only=True)
-        ws = self.wb.create_sheet() #write-only workbooks don't come with a starter sheet. 
+        ws = self.wb.create_sheet() #write-only workbooks don't come with a starter sheet.
         ws.append(["This file was created on",date.today()])
-        ws.append(headers)
+        ws.append(self.headers)
+        return ws
+
+    @staticmethod
+    def _row(ws, elem: FolderElem) -> list:
+        """Turn an element into a row of the sheet"""
+        #style the hyperlink
+        linkcell = openpyxl.cell.WriteOnlyCell(ws,    #type:ignore
+                   value=f'=HYPERLINK("{elem.link}")' if elem.link else '')
+        linkcell.style = "Hyperlink"
+
+        #write the data
+        return [elem.path,
+                elem.name,
+                elem.type.name,
+                '',
+                linkcell]
 
+
+class StreamingExcelWriter(ExcelWriter):
+    """
+    Write rows as they arrive instead of holding them until the end.
+    The write-only sheet is opened up front and rows are handed to it
+    in batches of buffer_size. openpyxl streams write-only sheets to a
+    temporary file, so memory stays flat however big the tree is.
+    The workbook is saved under a .part name and renamed into place,
+    so filename is never left half written.
+    """
+
+    def __init__(self, filename: str, buffer_size: int = 500):
+        super().__init__(filename)
+        self.buffer_size = buffer_size
+        self.ws = self._start_wb()
+
+    def append(self, listing: FolderElem) -> None:
+        self._internal_array.append(listing)
+        self.rows += 1
+        if len(self._internal_array) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Hand the buffered rows to the sheet"""
         for elem in self._internal_array:
-            #style the hyperlink
-            linkcell = openpyxl.cell.WriteOnlyCell(ws,    #type:ignore
-                       value=f'=HYPERLINK("{elem.link}")' if elem.link else '') 
-            linkcell.style = "Hyperlink"
-            
-            #write the data
-            ws.append([elem.path,
-                       elem.name,
-                       elem.type.name,
-                       '',
-                       linkcell])
-        self.wb.save(filename)
+            self.ws.append(self._row(self.ws, elem))
+        self._internal_array.clear()
+
+    def write_wb(self, filename: str = "") -> None:
+        """
+        Finish the workbook. A write-only workbook can only be saved once,
+        so this closes the writer.
+        """
+        filename = filename or self.filename
+        self.flush()
+        self.wb.save(filename + ".part")
+        os.replace(filename + ".part", filename)
+        self.closed = True
@@ -1,12 +1,29 @@
 """
 Represent cognos nodes in python. Data storage class
 """
+import threading
 from enum import Enum
+from typing import Dict, List
 class FolderElem():
     """
-    Represents an element of the folder. 
-    Takes path as a list of locations and stores it 
-    internally as a slash delimited path"""
+    Represents an element of the folder.
+    Takes path as a list of locations and stores it
+    internally as a slash delimited path.
+
+    There can be hundreds of thousands of these, so they're kept small:
+    no __dict__, elements in the same folder share one interned copy of
+    its path, and the link is only built when asked for,
+    from the prefix (linkbase) of the driver that found the element.
+    modified is when cognos says the element last changed, if the driver
+    can tell (HttpDriver can, SeleniumDriver can't)."""
+
+    __slots__ = ("type", "name", "modified", "_path", "_link", "_linkbase")
+
+    # Parent folder paths seen so far, each mapped to its interned copy.
+    # Elements hold the copy itself, so forget_paths() can empty this
+    # between crawls without touching elements that are still around.
+    _paths: Dict[str, str] = {}
+    _lock = threading.Lock()
 
     class ElemType(Enum):
         """Types of element in the Cognos directory tree"""
@@ -37,15 +54,62 @@ class FolderElem():
                 return cls.UnknownType
 
     def __init__(self, type: 'FolderElem.ElemType',
-                 name: str, path: list[str], link: str = ""):
+                 name: str, path: List[str] | str, link: str = "",
+                 linkbase: str | None = None, modified: str = ""):
         self.type = type
         self.name = name
-        self.path = f"/{'/'.join(path)}/" if path else "/"
-        self.link = link
-        self.linkpath = self.path+self.name+"/" if type == "Folder" else None
+        self.modified = modified
+        self.path = path  # type:ignore  # the setter formats lists
+        self._link = link
+        self._linkbase = linkbase
+
+    @classmethod
+    def intern_path(cls, path: str) -> str:
+        """The shared copy of a formatted path, adding it to the table if it's new"""
+        try:
+            return cls._paths[path]
+        except KeyError:
+            with cls._lock:
+                return cls._paths.setdefault(path, path)
+
+    @classmethod
+    def forget_paths(cls) -> None:
+        """Empty the table, so a new crawl doesn't keep every path of the last one"""
+        with cls._lock:
+            cls._paths = {}
+
+    @property
+    def path(self) -> str:
+        """Slash delimited path of the folder this element is in"""
+        return self._path
+
+    @path.setter
+    def path(self, value: List[str] | str) -> None:
+        if not isinstance(value, str):
+            value = f"/{'/'.join(value)}/" if value else "/"
+        self._path = FolderElem.intern_path(value)
+
+    @property
+    def link(self) -> str:
+        """Link to the element in cognos, built from linkbase if need be"""
+        if self._link or self._linkbase is None:
+            return self._link
+        # Same as linkbase + "/".join(path + [name])
+        return self._linkbase + self.path[1:] + self.name
+
+    @link.setter
+    def link(self, value: str) -> None:
+        self._link = value
+
+    @property
+    def linkpath(self) -> str | None:
+        """The path of the folder this element is, if it is one"""
+        if self.type == FolderElem.ElemType.Folder:
+            return self.path+self.name+"/"
+        return None
 
     def __repr__(self) -> str:
-        path = self.path[1:-1].split("/") if self.path == '/' else []
+        path = self.path[1:-1].split("/") if self.path != '/' else []
         link = f"'{self.link}'" if self.link else None
         return f"folder_elem('{self.type}','{self.name}',{path},{link})"
 
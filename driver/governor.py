@@ -0,0 +1,187 @@
+"""
+Keep a crawl from reading more folders at once than cognos can take.
+"""
+import logging
+import math
+import random
+import statistics
+import threading
+import time
+from typing import Callable, List, TypeVar
+
+from src.driver.control import ControlChannel
+from src.driver.folderelem import FolderElem
+from src.driver.metrics import CALLS, Metrics
+from src.driver.traversal import Lister
+
+T = TypeVar("T")
+
+
+class Governor():
+    """
+    An AIMD limit on how many folders are read at once, between minimum
+    and maximum (the number of listers).
+
+    The drivers report how long cognos takes to answer (each request
+    for HttpDriver, each wait for a folder to load for SeleniumDriver)
+    through observe(). Every window of those, the limit goes up by one if
+    it was reached and cognos kept up, and is cut by decrease if answers
+    took more than tolerance times the fastest window so far, or more
+    than max_error_rate of the folder reads failed.
+
+    A read that fails with one of backoff_on (timeouts, clicks landing
+    on something still loading) cuts the limit straight away and holds
+    every read back for a jittered, exponentially growing delay before
+    it's tried again, up to retries times.
+    """
+
+    def __init__(self, logger: logging.Logger, maximum: int, minimum: int = 1,
+                 initial: int = 0, window: int = 20, tolerance: float = 2,
+                 decrease: float = .5, max_error_rate: float = .05,
+                 backoff: float = 1, max_backoff: float = 60, retries: int = 3,
+                 backoff_on: tuple[type[Exception], ...] = (TimeoutError,),
+                 metrics: Metrics | None = None,
+                 control: ControlChannel | None = None):
+        self.logger = logger
+        self.maximum = maximum
+        self.minimum = min(minimum, maximum)
+        # Start in the middle: cognos may already be busy
+        self.limit = initial or max(self.minimum, (maximum + 1)//2)
+        self.window = window
+        self.tolerance = tolerance
+        self.decrease = decrease
+        self.max_error_rate = max_error_rate
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retries = retries
+        self.backoff_on = backoff_on
+        self.metrics = metrics
+        self.control = control
+        self.in_flight = 0
+        self.baseline = math.inf  # Mean answer time of the fastest window
+        self.__answers: List[float] = []
+        self.__reads = 0
+        self.__errors = 0
+        self.__saturated = False  # Whether the limit was reached this window
+        self.__failures = 0  # Backoffs since the last good read
+        self.__resume_at = 0.0
+        self.__cond = threading.Condition()
+
+    def observe(self, seconds: float) -> None:
+        """How long cognos took to answer something"""
+        with self.__cond:
+            self.__answers.append(seconds)
+            if len(self.__answers) >= self.window:
+                self.__adjust()
+
+    def acquire(self) -> None:
+        """Wait for a slot to read a folder in"""
+        with self.__cond:
+            while True:
+                if self.control is not None:
+                    self.control.check(block=False)  # Raises once cancelled
+                wait = self.__resume_at - time.monotonic()
+                if wait <= 0 and self.in_flight < self.limit:
+                    break
+                # Wake up now and then to notice a cancel
+                self.__cond.wait(min(wait, .25) if wait > 0 else .25)
+            self.in_flight += 1
+            if self.in_flight >= self.limit:
+                self.__saturated = True
+
+    def release(self, failed: bool = False) -> None:
+        """A folder read is over"""
+        with self.__cond:
+            self.in_flight -= 1
+            self.__reads += 1
+            if failed:
+                self.__errors += 1
+            else:
+                self.__failures = 0
+            self.__cond.notify_all()
+
+    def call(self, function: Callable[..., T], *args) -> T:
+        """Read a folder with function in a slot, backing off and retrying as need be"""
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                result = function(*args)
+            except self.backoff_on as e:
+                self.release(failed=True)
+                delay = self.__back_off()
+                if attempt >= self.retries:
+                    raise
+                attempt += 1
+                self.logger.warning("%s: %s. Trying again in %.1f s",
+                                    type(e).__name__, e, delay)
+                continue
+            except BaseException:
+                self.release(failed=True)
+                raise
+            self.release()
+            return result
+
+    def __back_off(self) -> float:
+        """Hold every read back for a while and cut the limit. Returns the delay."""
+        with self.__cond:
+            self.__failures += 1
+            ceiling = min(self.max_backoff, self.backoff*2**(self.__failures - 1))
+            delay = ceiling/2 + random.uniform(0, ceiling/2)
+            now = time.monotonic()
+            # Everyone that failed together only cuts the limit once
+            if now >= self.__resume_at:
+                self.__cut("cognos timed out or wasn't ready")
+            self.__resume_at = max(self.__resume_at, now + delay)
+        if self.metrics is not None:
+            self.metrics.count("backoffs")
+            self.metrics.observe("backoff", delay)
+        return delay
+
+    def __adjust(self) -> None:
+        """Move the limit at the end of a window. Call with the lock held."""
+        mean = statistics.mean(self.__answers)
+        self.baseline = min(self.baseline, mean)
+        if self.__reads and self.__errors/self.__reads > self.max_error_rate:
+            self.__cut(f"{self.__errors} of {self.__reads} folder reads failed")
+        elif mean > self.tolerance*self.baseline:
+            self.__cut(f"answers slowed from {1000*self.baseline:.0f} ms "
+                       f"to {1000*mean:.0f} ms")
+        elif self.__saturated and self.limit < self.maximum:
+            self.limit += 1
+            self.logger.debug("Raising folder reads at once to %d", self.limit)
+            if self.metrics is not None:
+                self.metrics.count("concurrency_increases")
+        self.__restart()
+        if self.metrics is not None:
+            self.metrics.observe("concurrency", self.limit, CALLS)
+
+    def __cut(self, reason: str) -> None:
+        """Multiplicative decrease. Call with the lock held."""
+        limit = max(self.minimum, int(self.limit*self.decrease))
+        if limit < self.limit:
+            self.logger.info("Cutting folder reads at once from %d to %d: %s",
+                             self.limit, limit, reason)
+            self.limit = limit
+            if self.metrics is not None:
+                self.metrics.count("concurrency_decreases")
+        self.__restart()
+
+    def __restart(self) -> None:
+        """Start a new window. Call with the lock held."""
+        self.__answers = []
+        self.__reads = 0
+        self.__errors = 0
+        self.__saturated = False
+
+
+class GovernedLister():
+    """A Lister that reads folders only as fast as the governor lets it"""
+
+    def __init__(self, lister: Lister, governor: Governor):
+        self.lister = lister
+        self.governor = governor
+
+    def list_folder(self, path: List[str]) \
+            -> tuple[List[FolderElem], List[FolderElem]]:
+        return self.governor.call(self.lister.list_folder, path)
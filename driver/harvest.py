@@ -0,0 +1,108 @@
+"""
+Read a folder's rows while the DataTable is still loading them.
+Cognos only puts the first screenful or so of a big folder in the DOM
+and loads more as the table is scrolled, so one look at the rows can
+come back short.
+"""
+import time
+from typing import List
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+# Rows not read yet, at most arguments[1] of them. A row is marked read
+# with a property rather than an attribute, so it doesn't count as a
+# mutation to the readiness waits. With arguments[2] set, file rows are
+# dropped from the DOM once read so a huge folder doesn't pile up in the
+# browser; folder rows stay, since travel clicks on them. Once every row
+# in the DOM is read, the table is scrolled to the bottom for more.
+HARVEST_SCRIPT = """
+    let pane = arguments[0], limit = arguments[1], prune = arguments[2];
+    let body = pane.querySelector('.dataTables_scrollBody');
+    let rows = [], more = false;
+    for (let row of pane.querySelectorAll('tr[data-name]')) {
+        if (row.__jspiderRead) continue;
+        if (rows.length >= limit) {
+            more = true;
+            break;
+        }
+        row.__jspiderRead = true;
+        let icon = row.querySelector(':scope > td > div[title][role="img"]');
+        let title = icon ? icon.getAttribute('title') : '';
+        rows.push([row.getAttribute('data-name'), title]);
+        if (prune && title != 'Folder') row.remove();
+    }
+    if (!more && body) body.scrollTop = body.scrollHeight;
+    let processing = document.querySelector('.dataTables_processing');
+    return {
+        rows: rows,
+        more: more,
+        loading: processing !== null && processing.offsetParent !== null,
+        height: body ? body.scrollHeight : 0,
+        scrolls: body !== null && body.scrollHeight > body.clientHeight + 1
+    };
+    """
+
+
+class Harvester():
+    """
+    Collect every row of the folder in pane, a chunk at a time.
+    Each chunk is one execute_script call. Rows seen twice (a redraw puts
+    the same row back) are only kept once. The folder is done when
+    everything in the DOM has been read and either the table doesn't
+    scroll (so there's nothing more to load), or it has been scrolled to
+    the bottom and quiet_ms went by with no new rows, no loading
+    indicator and no change in height.
+    """
+
+    def __init__(self, driver: WebDriver, pane: WebElement, chunk: int = 500,
+                 prune_after: int = 1000, quiet_ms: float = 250,
+                 timeout: float = 60, poll: float = .05):
+        self.driver = driver
+        self.pane = pane
+        self.chunk = chunk
+        self.prune_after = prune_after  # 0 never drops rows
+        self.quiet_ms = quiet_ms
+        self.timeout = timeout
+        self.poll = poll
+        self.chunks = 0  # execute_script calls it took
+        self.duplicates = 0
+        # Rows may have been dropped from the DOM, so it no longer holds the folder
+        self.pruned = False
+
+    def harvest(self) -> List[tuple[str, str]]:
+        """(data-name, type title) of every row in the folder, in table order"""
+        rows: List[tuple[str, str]] = []
+        seen = set()
+        start = time.perf_counter()
+        quiet_since = start
+        height = -1
+        while True:
+            prune = bool(self.prune_after) and len(rows) >= self.prune_after
+            self.pruned = self.pruned or prune
+            result = self.driver.execute_script(
+                HARVEST_SCRIPT, self.pane, self.chunk, prune)
+            self.chunks += 1
+            now = time.perf_counter()
+            for name, title in result["rows"]:
+                if (name, title) in seen:
+                    self.duplicates += 1
+                    continue
+                seen.add((name, title))
+                rows.append((name, title))
+
+            if result["more"]:
+                continue  # Still reading what's already there
+            if not result["scrolls"] and not result["loading"] and height < 0:
+                return rows  # It all fit on the first look
+            if result["rows"] or result["loading"] or result["height"] != height:
+                quiet_since = now
+                height = result["height"]
+            elif 1000*(now - quiet_since) >= self.quiet_ms:
+                return rows
+            if now - start > self.timeout:
+                raise TimeoutException(
+                    f"Folder was still loading rows after {self.timeout} s")
+            if not result["rows"]:
+                time.sleep(self.poll)
@@ -0,0 +1,234 @@
+"""
+List cognos folders over the REST api its own UI uses, without a browser.
+"""
+import http.client
+import http.cookies
+import json
+import logging
+import threading
+import time
+from typing import Dict, List
+from urllib.parse import quote, urlsplit
+
+from src.driver.control import ControlChannel
+from src.driver.folderelem import FolderElem
+from src.driver.governor import Governor
+from src.driver.metrics import Metrics, timed
+import src.exceptions
+from src.logs import *
+
+COGNOS_URL = "https://cognos-prod.ec.sou.edu/ibmcognos11/bi"
+# Connections kept open, so folders listed at once
+POOL_SIZE = 8
+
+# Cognos object types, as the REST api names them
+TYPES: Dict[str, FolderElem.ElemType] = {
+    "interactiveReport": FolderElem.ElemType.Active_Report,
+    "agentDefinition": FolderElem.ElemType.Agent,
+    "exploration": FolderElem.ElemType.Dashboard,
+    "module": FolderElem.ElemType.Data_module,
+    "folder": FolderElem.ElemType.Folder,
+    "package": FolderElem.ElemType.Package,
+    "page": FolderElem.ElemType.Page,
+    "query": FolderElem.ElemType.Query,
+    "report": FolderElem.ElemType.Report,
+    "reportView": FolderElem.ElemType.Report_View,
+    "shortcut": FolderElem.ElemType.Shortcut,
+    "story": FolderElem.ElemType.Story,
+    "uploadedFile": FolderElem.ElemType.Uploaded_file,
+}
+# The portal gives uploaded spreadsheets types of their own, by extension
+UPLOADED_TYPES: Dict[str, FolderElem.ElemType] = {
+    ".csv": FolderElem.ElemType.CSV,
+    ".xlsx": FolderElem.ElemType.XLSX,
+}
+
+
+def elem_type(item: dict) -> FolderElem.ElemType:
+    """The ElemType of an item in a REST listing"""
+    type = TYPES.get(item.get("type", ""), FolderElem.ElemType.UnknownType)
+    if type == FolderElem.ElemType.Uploaded_file:
+        name = item.get("defaultName", "").lower()
+        for extension, uploaded in UPLOADED_TYPES.items():
+            if name.endswith(extension):
+                return uploaded
+    return type
+
+
+class HttpDriver():
+    """
+    Stand in for SeleniumDriver that talks to cognos directly.
+    Logs in once and reuses the session cookies on a pool of
+    keep-alive connections (one per thread), so list_folder can be
+    called from several threads at once.
+    """
+
+    def __init__(self, logger: logging.Logger,
+                 base_url: str = "",
+                 my_loc: str = "Team Content",
+                 pool_size: int = POOL_SIZE,
+                 timeout: float = 60,
+                 metrics: Metrics | None = None,
+                 control: ControlChannel | None = None):
+        self.logger = logger
+        self.metrics = metrics
+        # Pauses and cancels the run process between requests
+        self.control: ControlChannel = control or ControlChannel()
+        # Told how long each request took, to pace the crawl by
+        self.governor: Governor | None = None
+        self.base_url = (base_url or COGNOS_URL).rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.path: List[str] = []
+
+        if my_loc == "Team Content":
+            self.loc = ".public_folders%2F"
+            root_id = ".public_folders"
+        else:
+            self.loc = ".my_folders%2F"
+            root_id = ".my_folders"
+        self.linkpath = self.base_url + "/?pathRef=" + self.loc
+
+        # Object ids of every folder we've seen, by path
+        self.ids: Dict[tuple[str, ...], str] = {(): root_id}
+        self.cookies: Dict[str, str] = {}
+
+        url = urlsplit(self.base_url)
+        self.__scheme = url.scheme
+        self.__netloc = url.netloc
+        self.__prefix = url.path
+        self.__local = threading.local()
+        self.__connections: List[http.client.HTTPConnection] = []
+        self.__lock = threading.Lock()
+
+    def __connection(self) -> http.client.HTTPConnection:
+        """This thread's connection to cognos"""
+        conn = getattr(self.__local, "conn", None)
+        if conn is None:
+            if self.__scheme == "https":
+                conn = http.client.HTTPSConnection(self.__netloc,
+                                                   timeout=self.timeout)
+            else:
+                conn = http.client.HTTPConnection(self.__netloc,
+                                                  timeout=self.timeout)
+            self.__local.conn = conn
+            with self.__lock:
+                self.__connections.append(conn)
+        return conn
+
+    def request(self, method: str, endpoint: str,
+                body: dict | None = None) -> tuple[int, dict]:
+        """Send a request to the api and return (status, decoded json)"""
+        self.control.check()
+        headers = {"Accept": "application/json"}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        if "XSRF-TOKEN" in self.cookies:
+            headers["X-XSRF-Token"] = self.cookies["XSRF-TOKEN"]
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+
+        # A kept-alive connection may have been closed by the server.
+        # Retry once on a fresh one.
+        start = time.perf_counter()
+        for attempt in range(2):
+            conn = self.__connection()
+            try:
+                conn.request(method, self.__prefix + endpoint, data, headers)
+                response = conn.getresponse()
+                payload = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                conn.close()
+                if attempt:
+                    raise
+        seconds = time.perf_counter() - start
+        if self.metrics is not None:
+            self.metrics.count("http_requests")
+            self.metrics.observe("http." + method, seconds)
+        if self.governor is not None:
+            self.governor.observe(seconds)
+
+        for header in response.headers.get_all("Set-Cookie") or []:
+            for name, morsel in http.cookies.SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        return response.status, json.loads(payload) if payload else {}
+
+    @timed("login")
+    def login(self, uname: str, passw: str) -> None:
+        """Login to cognos. This class does not store login information"""
+        self.logger.info("Logging in")
+        status, _ = self.request("PUT", "/v1/login", {"parameters": [
+            {"name": "CAMUsername", "value": uname},
+            {"name": "CAMPassword", "value": passw}]})
+        if status >= 400:
+            self.logger.error("Error: Incorrect login credentials.")
+            raise src.exceptions.LoginException(
+                "Cognos did not accept credentials")
+        self.logger.info("Successfully logged in")
+
+    def items(self, path: List[str]) -> List[dict]:
+        """The raw listing of a (global) folder"""
+        status, listing = self.request(
+            "GET", f"/v1/objects/{quote(self.resolve(path), safe='')}"
+                   "/items?fields=defaultName,type,modificationTime")
+        if status >= 400:
+            raise src.exceptions.StateException(
+                f"Cognos returned {status} listing /{'/'.join(path)}/")
+        for item in listing.get("data", []):
+            if item.get("type") == "folder":
+                self.ids[tuple(path)+(item["defaultName"],)] = item["id"]
+        return listing.get("data", [])
+
+    def resolve(self, path: List[str]) -> str:
+        """Find the object id of a (global) folder, listing parents if need be"""
+        key = tuple(path)
+        if key not in self.ids:
+            self.items(path[:-1])
+            if key not in self.ids:
+                raise src.exceptions.StateException(
+                    f"No folder named /{'/'.join(path)}/")
+        return self.ids[key]
+
+    @timed("list_folder")
+    def list_folder(self, path: List[str]) -> tuple[List[FolderElem], List[FolderElem]]:
+        """
+        Read a (global) folder. Same contract as SeleniumDriver.list_folder:
+        returns the rows to record and the subfolders to visit.
+        """
+        items = self.items(path)
+        if self.metrics is not None:
+            self.metrics.count("folders")
+        if not items:
+            self.logger.warning(f"Found an empty folder: {path}")
+            return [FolderElem(FolderElem.ElemType.Empty_Folder,
+                               path[-1], path)], []
+
+        files: List[FolderElem] = []
+        folders: List[FolderElem] = []
+        for item in items:
+            elem = FolderElem(elem_type(item), item["defaultName"], path,
+                              linkbase=self.linkpath,
+                              modified=item.get("modificationTime", ""))
+            self.logger.info("%s: %s", elem.type.name, elem.name)
+            self.logger.log(LINK, "link: %s", elem.link)
+            if elem.type == FolderElem.ElemType.Folder:
+                folders.append(elem)
+            else:
+                files.append(elem)
+        return files, folders
+
+    def travel_path(self, path: str) -> None:
+        """Travel to a particular (global) folder."""
+        self.path = self.path + [folder for folder in path.strip("/ ").split("/")
+                                 if folder]
+        self.resolve(self.path)
+
+    def quit(self) -> None:
+        """Close every pooled connection"""
+        with self.__lock:
+            for conn in self.__connections:
+                conn.close()
+            self.__connections.clear()
@@ -0,0 +1,157 @@
+"""
+Keep folder listings on disk between runs, so crawls of overlapping
+subtrees don't list the same folders over and over.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List
+
+from src.driver.folderelem import FolderElem
+from src.driver.metrics import Metrics
+from src.driver.traversal import Lister
+
+# Where the cache lives unless told otherwise
+CACHE_FILE = os.path.join(os.path.expanduser("~"), ".jspider", "listings.sqlite")
+# Listings older than this are no use to anyone, whatever age their runs accept
+MAX_KEEP = 30*24*60*60
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS listings (
+        root TEXT NOT NULL,
+        path TEXT NOT NULL,
+        listed REAL NOT NULL,
+        used REAL NOT NULL,
+        size INTEGER NOT NULL,
+        listing TEXT NOT NULL,
+        PRIMARY KEY (root, path)
+    );
+    CREATE INDEX IF NOT EXISTS listings_used ON listings (used);
+    """
+
+
+class ListingCache():
+    """
+    Folder listings in a sqlite file, keyed by content root (which cognos,
+    which content area, and whose My Content) and folder path.
+    A listing older than max_age seconds is never handed out, but it stays:
+    the cache is shared, and another run may accept older listings than
+    this one. Listings go once they're older than max_keep, or when they
+    add up to more than max_bytes, least recently used first.
+    Safe to share between threads.
+    """
+
+    def __init__(self, filename: str, max_age: float,
+                 max_bytes: int = 256*2**20, max_keep: float = MAX_KEEP):
+        self.filename = filename
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.max_keep = max_keep
+        if os.path.dirname(filename):
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+        self.__db = sqlite3.connect(filename, check_same_thread=False)
+        self.__db.executescript(SCHEMA)
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(path: List[str]) -> str:
+        """Same format as FolderElem.path"""
+        return f"/{'/'.join(path)}/" if path else "/"
+
+    def get(self, root: str, path: List[str]) \
+            -> tuple[List[FolderElem], List[FolderElem]] | None:
+        """A fresh enough listing of a folder, as (rows, folders), or None"""
+        key = self.key(path)
+        now = time.time()
+        with self.__lock:
+            found = self.__db.execute(
+                "SELECT listing FROM listings WHERE root = ? AND path = ? AND listed >= ?",
+                (root, key, now - self.max_age)).fetchone()
+            if found is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.__db.execute("UPDATE listings SET used = ? WHERE root = ? AND path = ?",
+                              (now, root, key))
+            self.__db.commit()
+        rows, folders = json.loads(found[0])
+        return ([self.elem(key, *row) for row in rows],
+                [self.elem(key, *row) for row in folders])
+
+    @staticmethod
+    def elem(key: str, type: str, name: str, link: str, modified: str = "") -> FolderElem:
+        """A cached row. Listings cached before modification times were kept have none."""
+        return FolderElem(FolderElem.ElemType[type], name, key, link, modified=modified)
+
+    def put(self, root: str, path: List[str], rows: List[FolderElem],
+            folders: List[FolderElem]) -> None:
+        """Remember a folder's listing"""
+        listing = json.dumps([[[elem.type.name, elem.name, elem.link, elem.modified]
+                               for elem in rows],
+                              [[elem.type.name, elem.name, elem.link, elem.modified]
+                               for elem in folders]])
+        now = time.time()
+        with self.__lock:
+            self.__db.execute(
+                "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?, ?)",
+                (root, self.key(path), now, now, len(listing), listing))
+            self.__db.commit()
+
+    def evict(self) -> int:
+        """
+        Drop listings older than max_keep, then the least recently used
+        until the rest fit in max_bytes. Returns how many went.
+        """
+        with self.__lock:
+            dropped = self.__db.execute("DELETE FROM listings WHERE listed < ?",
+                                        (time.time() - self.max_keep,)).rowcount
+            total = self.__db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM listings").fetchone()[0]
+            if total > self.max_bytes:
+                cursor = self.__db.execute(
+                    "SELECT root, path, size FROM listings ORDER BY used")
+                doomed = []
+                for root, path, size in cursor.fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((root, path))
+                    total -= size
+                self.__db.executemany(
+                    "DELETE FROM listings WHERE root = ? AND path = ?", doomed)
+                dropped += len(doomed)
+            self.__db.commit()
+        return dropped
+
+    def close(self) -> None:
+        self.evict()
+        with self.__lock:
+            self.__db.close()
+
+
+class CachedLister():
+    """
+    A Lister that checks the cache before asking the one it wraps,
+    and caches whatever that one lists.
+    """
+
+    def __init__(self, lister: Lister, cache: ListingCache, root: str,
+                 metrics: Metrics | None = None):
+        self.lister = lister
+        self.cache = cache
+        self.root = root
+        self.metrics = metrics
+
+    def list_folder(self, path: List[str]) \
+            -> tuple[List[FolderElem], List[FolderElem]]:
+        listing = self.cache.get(self.root, path)
+        if self.metrics is not None:
+            self.metrics.count("cache_hits" if listing is not None else "cache_misses")
+        if listing is not None:
+            return listing
+        rows, folders = self.lister.list_folder(path)
+        self.cache.put(self.root, path, rows, folders)
+        return rows, folders
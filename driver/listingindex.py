@@ -0,0 +1,147 @@
+"""
+Remember what every folder held last run, so a re-crawl can tell what changed.
+"""
+import csv
+import hashlib
+import json
+import os
+from typing import Dict, List
+
+from src.driver.folderelem import FolderElem
+from src.driver.traversal import Lister
+
+
+def fingerprint(rows: List[FolderElem], folders: List[FolderElem]) -> str:
+    """
+    A cheap hash of a folder listing: what's in it, what type each thing is,
+    and when it last changed, if the driver knows
+    """
+    listing = sorted((elem.type.name, elem.name, elem.modified)
+                     for elem in rows + folders)
+    return hashlib.sha1(json.dumps(listing).encode()).hexdigest()
+
+
+class ListingIndex():
+    """
+    The listings of the last complete crawl, keyed by folder path.
+    Each entry holds the folder's fingerprint, its rows, the names of its
+    subfolders and the folder's own modification time. While a new crawl
+    runs, update() builds the next index.
+
+    Every folder is still read: a folder's own listing says nothing about
+    the folders under it. The fingerprints only keep write_diff() from
+    comparing listings that haven't changed. The one listing that can be
+    skipped is that of a folder with no subfolders whose modification time
+    (from its parent's listing, so only with the http backend) is the same
+    as last time. See unchanged_leaf().
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.old: Dict[str, dict] = {}
+        self.new: Dict[str, dict] = {}
+        if os.path.exists(filename):
+            with open(filename, encoding="utf-8") as file:
+                self.old = json.load(file)
+        for entry in self.old.values():  # Indexes from before modification times
+            entry.setdefault("modified", "")
+            entry["rows"] = [(row + [""])[:4] for row in entry["rows"]]
+        # This crawl's modification times of the folders it found, by key
+        self.modified: Dict[str, str] = {}
+        self.same: set[str] = set()  # keys of listings that match the last crawl's
+        self.skipped = 0  # folders not read at all
+
+    @staticmethod
+    def key(path: List[str]) -> str:
+        """Same format as FolderElem.path"""
+        return f"/{'/'.join(path)}/" if path else "/"
+
+    def update(self, path: List[str], rows: List[FolderElem],
+               folders: List[FolderElem]) -> None:
+        """Record a fresh folder listing"""
+        key = self.key(path)
+        for folder in folders:
+            self.modified[key + folder.name + "/"] = folder.modified
+        digest = fingerprint(rows, folders)
+        old = self.old.get(key)
+        if old is not None and old["fingerprint"] == digest:
+            self.same.add(key)
+            self.new[key] = {**old, "modified": self.modified.get(key, "")}
+            return
+        self.new[key] = {"fingerprint": digest,
+                         "modified": self.modified.get(key, ""),
+                         "rows": [[elem.type.name, elem.name, elem.link, elem.modified]
+                                  for elem in rows],
+                         "folders": [elem.name for elem in folders]}
+
+    def unchanged_leaf(self, path: List[str]) -> List[FolderElem] | None:
+        """
+        The rows of a folder last crawl had no subfolders in, if its
+        modification time says it hasn't changed since. Otherwise None,
+        and the folder has to be read.
+        """
+        key = self.key(path)
+        modified = self.modified.get(key, "")
+        old = self.old.get(key)
+        if not modified or old is None or old.get("modified") != modified \
+                or old["folders"]:
+            return None
+        self.skipped += 1
+        return [FolderElem(FolderElem.ElemType[type], name, key, link,
+                           modified=changed)
+                for type, name, link, changed in old["rows"]]
+
+    def save(self) -> None:
+        """Make this crawl's listings the ones the next crawl compares against"""
+        tmp = self.filename + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as file:
+            json.dump(self.new, file)
+        os.replace(tmp, self.filename)
+
+    def write_diff(self, filename: str) -> int:
+        """
+        Write the rows that were added, removed, changed type or (going by
+        modification times) were edited since the last crawl to a csv.
+        Returns how many there were.
+        """
+        changes = []
+        for key in self.old.keys() | self.new.keys():
+            if key in self.same:
+                continue
+            old_entry, new_entry = self.old.get(key), self.new.get(key)
+            old = {row[1]: row for row in old_entry["rows"]} if old_entry else {}
+            new = {row[1]: row for row in new_entry["rows"]} if new_entry else {}
+            for name, (type, _, _, modified) in new.items():
+                if name not in old:
+                    changes.append(["Added", key, name, "", type])
+                elif old[name][0] != type:
+                    changes.append(["Retyped", key, name, old[name][0], type])
+                elif modified and old[name][3] and old[name][3] != modified:
+                    changes.append(["Modified", key, name, type, type])
+            for name, (type, *_) in old.items():
+                if name not in new:
+                    changes.append(["Removed", key, name, type, ""])
+
+        with open(filename, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Change", "Path", "File", "Old Type", "New Type"])
+            writer.writerows(sorted(changes, key=lambda row: (row[1], row[2])))
+        return len(changes)
+
+
+class IncrementalLister():
+    """
+    A Lister that hands back last crawl's rows for folders the index says
+    are unchanged leaves, and asks the one it wraps for everything else.
+    """
+
+    def __init__(self, lister: Lister, index: ListingIndex):
+        self.lister = lister
+        self.index = index
+
+    def list_folder(self, path: List[str]) \
+            -> tuple[List[FolderElem], List[FolderElem]]:
+        rows = self.index.unchanged_leaf(path)
+        if rows is not None:
+            return rows, []
+        return self.lister.list_folder(path)
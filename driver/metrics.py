@@ -0,0 +1,164 @@
+"""
+Where a crawl's time goes: latency histograms per operation, counters,
+and how fast nodes are coming in. Written out as json or prometheus text.
+"""
+import bisect
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Generator, List, TypeVar
+
+# Bucket upper bounds, in seconds for timings
+SECONDS = [.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 300]
+# and in calls for counts like webdriver calls per folder
+CALLS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+F = TypeVar("F", bound=Callable)
+
+
+class Histogram():
+    """Cumulative-bucket histogram, the way prometheus keeps them"""
+
+    def __init__(self, buckets: List[float] = SECONDS):
+        self.buckets = buckets
+        self.counts = [0]*(len(buckets)+1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket the q'th quantile falls in"""
+        rank = q*self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "sum": self.sum, "max": self.max,
+                "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"],
+                                    self.counts))}
+
+
+class Metrics():
+    """
+    Everything measured during one crawl. Safe to share between threads.
+    Timings are histograms of seconds under a name like "travel";
+    counters are plain totals like "webdriver_calls".
+    """
+
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+        self.started = time.time()
+        self.__lock = threading.Lock()
+
+    def observe(self, name: str, value: float,
+                buckets: List[float] = SECONDS) -> None:
+        """Add a value to the histogram called name"""
+        with self.__lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram(buckets)
+            self.histograms[name].observe(value)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self.__lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextlib.contextmanager
+    def timer(self, name: str) -> Generator[None, None, None]:
+        """Time the block into the histogram called name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def rate(self, name: str) -> float:
+        """How many of a counter per second since the crawl started"""
+        return self.counters.get(name, 0) / max(time.time() - self.started, 1e-9)
+
+    def summary(self) -> List[str]:
+        """One line per timing, then the counters"""
+        lines = []
+        with self.__lock:
+            histograms = dict(self.histograms)
+            counters = dict(self.counters)
+        for name, hist in sorted(histograms.items()):
+            if hist.buckets is SECONDS:
+                lines.append(f"{name}: {hist.count} x, "
+                             f"mean {1000*hist.sum/hist.count:.0f} ms, "
+                             f"p50 <{1000*hist.quantile(.5):.0f} ms, "
+                             f"p95 <{1000*hist.quantile(.95):.0f} ms, "
+                             f"total {hist.sum:.1f} s")
+            else:
+                lines.append(f"{name}: {hist.count} x, "
+                             f"mean {hist.sum/hist.count:.1f}, "
+                             f"p95 <{hist.quantile(.95):.0f}, "
+                             f"max {hist.max:.0f}")
+        for name, total in sorted(counters.items()):
+            lines.append(f"{name}: {total} ({self.rate(name):.1f}/s)")
+        return lines
+
+    def to_dict(self) -> dict:
+        with self.__lock:
+            return {"started": self.started,
+                    "elapsed": time.time() - self.started,
+                    "counters": dict(self.counters),
+                    "rates": {name: self.rate(name) for name in self.counters},
+                    "histograms": {name: hist.to_dict()
+                                   for name, hist in self.histograms.items()}}
+
+    def to_prometheus(self) -> str:
+        """The metrics in prometheus' text exposition format"""
+        lines = []
+        with self.__lock:
+            for name, total in sorted(self.counters.items()):
+                lines += [f"# TYPE jspider_{name}_total counter",
+                          f"jspider_{name}_total {total}"]
+            for name, hist in sorted(self.histograms.items()):
+                metric = f"jspider_{name.replace('.', '_')}"
+                if hist.buckets is SECONDS:
+                    metric += "_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                seen = 0
+                for bound, count in zip(hist.buckets + ["+Inf"], hist.counts):
+                    seen += count
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {seen}')
+                lines += [f"{metric}_sum {hist.sum}",
+                          f"{metric}_count {hist.count}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, filename: str) -> None:
+        """Write the metrics to filename: json if it ends in .json, else prometheus text"""
+        if filename.endswith(".json"):
+            text = json.dumps(self.to_dict(), indent=1)
+        else:
+            text = self.to_prometheus()
+        with open(filename + ".tmp", "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(filename + ".tmp", filename)
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Time every call of a method into self.metrics, if it has any"""
+    def decorator(method: F) -> F:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.metrics is None:
+                return method(self, *args, **kwargs)
+            with self.metrics.timer(name):
+                return method(self, *args, **kwargs)
+        return wrapper  # type:ignore
+    return decorator
@@ -0,0 +1,91 @@
+"""
+Wait for cognos to finish loading instead of sleeping a fixed amount.
+"""
+from typing import Dict, List
+
+# Counts every change to the folder pane. Installed lazily by arm(),
+# since a full page load (see SeleniumDriver.load_path) throws it away.
+OBSERVER_SCRIPT = """
+    if (window.__jspiderMutations === undefined) {
+        window.__jspiderMutations = 0;
+        window.__jspiderLastMutation = performance.now();
+        let MO = new MutationObserver(function (){
+            window.__jspiderMutations += 1;
+            window.__jspiderLastMutation = performance.now();
+        });
+        MO.observe(document.body, {childList: true, subtree: true,
+                                   characterData: true});
+    }
+    return window.__jspiderMutations;
+    """
+
+# One round trip that reports everything FolderReady cares about
+PROBE_SCRIPT = """
+    let pane = document.getElementById(arguments[0]);
+    let crumbs = pane ? pane.querySelectorAll('[class*="breadcrumb"]') : [];
+    return {
+        rows: pane ? pane.querySelectorAll('tr[data-name]').length : -1,
+        crumb: crumbs.length ? crumbs[crumbs.length-1].textContent.trim() : null,
+        mutations: window.__jspiderMutations === undefined ? -1 : window.__jspiderMutations,
+        quiet: performance.now() - (window.__jspiderLastMutation || 0)
+    };
+    """
+
+
+class FolderReady():
+    """
+    WebDriverWait condition: the folder pane has settled on a listing.
+    That means the breadcrumb names the folder we expect (when there is one),
+    the pane changed since we armed it (if asked), nothing has changed for
+    quiet_ms, and the row count is the same as on the last poll.
+    """
+
+    def __init__(self, pane_id: str, folder: str,
+                 armed_at: int = -1, quiet_ms: float = 150):
+        self.pane_id = pane_id
+        self.folder = folder
+        self.armed_at = armed_at
+        self.quiet_ms = quiet_ms
+        self.last_rows = -1
+
+    def __call__(self, driver) -> bool:
+        probe = driver.execute_script(PROBE_SCRIPT, self.pane_id)
+        rows, self.last_rows = self.last_rows, probe["rows"]
+        if probe["rows"] < 0 or probe["mutations"] <= self.armed_at:
+            return False
+        if self.folder and probe["crumb"] is not None \
+                and self.folder not in probe["crumb"]:
+            return False
+        return probe["quiet"] >= self.quiet_ms and probe["rows"] == rows
+
+
+class WaitStats():
+    """Keep track of how long the readiness waits took."""
+
+    def __init__(self):
+        self.waits: Dict[str, List[float]] = {}
+        # What the old fixed sleeps would have cost for the same waits
+        self.baseline: Dict[str, float] = {}
+
+    def record(self, kind: str, seconds: float, baseline: float = 0) -> None:
+        self.waits.setdefault(kind, []).append(seconds)
+        self.baseline[kind] = self.baseline.get(kind, 0) + baseline
+
+    def merge(self, other: "WaitStats") -> None:
+        """Fold another driver's waits into this one"""
+        for kind, waits in other.waits.items():
+            self.waits.setdefault(kind, []).extend(waits)
+            self.baseline[kind] = self.baseline.get(kind, 0) + other.baseline[kind]
+
+    def summary(self) -> List[str]:
+        """One line per kind of wait"""
+        lines = []
+        for kind, waits in self.waits.items():
+            waits = sorted(waits)
+            lines.append(f"{kind}: {len(waits)} waits, "
+                         f"mean {1000*sum(waits)/len(waits):.0f} ms, "
+                         f"p95 {1000*waits[int(.95*(len(waits)-1))]:.0f} ms, "
+                         f"total {sum(waits):.1f} s "
+                         f"(fixed sleeps: {self.baseline[kind]:.1f} s)")
+        return lines
+
@@ -3,33 +3,95 @@ Handle all the primitive selenium operations.
 """
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import ElementNotInteractableException
+from selenium.common.exceptions import (ElementNotInteractableException,
+                                        ElementClickInterceptedException,
+                                        JavascriptException,
+                                        TimeoutException,
+                                        WebDriverException)
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.remote.webelement import WebElement
-from typing import Generator, List
+from selenium.webdriver.remote.command import Command
+from typing import List
 from urllib.parse import quote
 import time
 import logging
+import threading
 
 from src.driver.folderelem import FolderElem
+from src.driver import readiness
+from src.driver.harvest import Harvester
+from src.driver.control import ControlChannel
+from src.driver.governor import Governor
+from src.driver.httpdriver import COGNOS_URL
+from src.driver.metrics import CALLS, Metrics, timed
 import src.exceptions
 from src.logs import *  # Yes, this is generally a bad idea.
 # This file is all the logging defines
 # and is tightly managed.
 
+# Firefox preferences for a crawl that only needs the DOM.
+# None of these touch the markup the selectors look at.
+LEAN_PREFS = {
+    "permissions.default.image": 2,  # no images (the type icons are titles anyway)
+    "image.animation_mode": "none",
+    "browser.display.use_document_fonts": 0,  # no web fonts
+    "gfx.downloadable_fonts.enabled": False,
+    "ui.prefersReducedMotion": 1,
+    "toolkit.cosmeticAnimations.enabled": False,
+    "media.autoplay.default": 5,
+    "network.prefetch-next": False,
+    "network.dns.disablePrefetch": True,
+    "network.http.speculative-parallel-limit": 0,
+    "browser.safebrowsing.malware.enabled": False,
+    "browser.safebrowsing.phishing.enabled": False,
+    "datareporting.policy.dataSubmissionEnabled": False,
+    "toolkit.telemetry.enabled": False,
+    "browser.shell.checkDefaultBrowser": False,
+    "dom.ipc.processCount": 1,  # one content process is plenty for one tab
+    "fission.autostart": False,
+}
+# Also skip stylesheets. Leaner still, but the waits for things to be
+# visible rely on cognos' layout, so check it against the real thing first.
+BARE_PREFS = {**LEAN_PREFS, "permissions.default.stylesheet": 2}
+PROFILES = {"full": {}, "lean": LEAN_PREFS, "bare": BARE_PREFS}
+# Profiles nobody has yet run benchmarks/profile.py with against a real
+# firefox, so neither the savings nor (for bare) the waits are confirmed
+EXPERIMENTAL_PROFILES = {"lean", "bare"}
+
 
 class SeleniumDriver():
     def __init__(self, logger: logging.Logger,
                  gecko_loc: str,
                  exe_loc: str = "",
                  headless: bool = False,
-                 my_loc: str = "Team Content"):
+                 my_loc: str = "Team Content",
+                 direct_nav: bool = False,
+                 metrics: Metrics | None = None,
+                 base_url: str = "",
+                 profile: str = "full",
+                 control: ControlChannel | None = None):
         self.path: List[str] = []
+        # Where cognos is. Point it somewhere else to crawl a test server.
+        self.base_url: str = (base_url or COGNOS_URL).rstrip("/")
+        # Load folders by pathRef instead of clicking through the tree
+        self.direct_nav: bool = direct_nav
+        # Read a folder's rows with one script instead of a call per row.
+        # A folder the script fails on is read row by row, and the next
+        # one gets the script again, unless the script itself is broken.
+        self.bulk_read: bool = True
+        # A folder failed part way, so there's no telling what the browser shows
+        self.lost: bool = False
         self.logger: logging.Logger = logger
         self.options: Options = Options()
-        self.cancel: bool = False  # synchronously cancel the run process
+        # Pauses and cancels the run process between browser commands
+        self.control: ControlChannel = control or ControlChannel()
+        # Told how long each folder took to load, to pace the crawl by
+        self.governor: Governor | None = None
+        self.waits = readiness.WaitStats()  # what the readiness waits cost
+        self.metrics = metrics  # timings and call counts, shared by the crawl
+        self.calls = 0  # commands sent to the browser
+        self.__calls_at_folder = 0
         if exe_loc:
             self.options.binary = exe_loc
 
@@ -39,40 +101,75 @@ class SeleniumDriver():
             logger.debug("Running in headless mode")
             self.options.add_argument("--headless")
 
+        # How much of cognos to bother loading. See PROFILES.
+        self.profile: str = profile
+        for name, value in PROFILES[profile].items():
+            self.options.set_preference(name, value)
+
+        # Firefox starts the first time self.driver is used
+        self.__driver: webdriver.Firefox | None = None
+        self.__launch_lock = threading.Lock()
+        self.__quit: bool = False
         # Declare it, but don't define it. Typehinting makes coding easier
-        self.driver: webdriver.Firefox
         self.loc: str
+        self.pane_id: str
+        self.linkpath: str
+        self.relocate(my_loc)
+
+    def relocate(self, my_loc: str) -> None:
+        """Switch between Team Content and My Content"""
         if my_loc == "Team Content":
             self.loc = ".public_folders%2F"
+            self.pane_id = "teamFoldersSlideoutContent"
         else:
             self.loc = ".my_folders%2F"
-        self.linkpath = "https://cognos-prod.ec.sou.edu/ibmcognos11/bi/?pathRef="+self.loc
-        self.driver = webdriver.Firefox(executable_path=self.gecko_loc,
-                                        options=self.options)
-
-    @property
-    def nodes_queued(self) -> int:
-        return self.__nodes_queued
-
-    @nodes_queued.setter
-    def nodes_queued(self, value: int) -> None:
-        """update nodes queued and report the value"""
-        self.__nodes_queued = value
-        self.logger.log(NODESQUEUED, str(self.__nodes_queued))
+            self.pane_id = "myContentSlideoutContent"
+        self.linkpath = self.base_url+"/?pathRef="+self.loc
 
     @property
-    def nodes_read(self) -> int:
-        return self.__nodes_read
-
-    @nodes_read.setter
-    def nodes_read(self, value: int) -> None:
-        self.__nodes_read = value
-        self.logger.log(NODESFINISHED, self.__nodes_read)
-
+    def driver(self) -> webdriver.Firefox:
+        """The browser. Launched on first use, since that takes a few seconds"""
+        if self.__driver is None:
+            with self.__launch_lock:
+                if self.__quit:
+                    # Cancelled before it ever got going
+                    raise src.exceptions.EarlyLeaveException
+                if self.__driver is None:
+                    self.logger.debug("Starting Firefox")
+                    start = time.perf_counter()
+                    driver = webdriver.Firefox(
+                        executable_path=self.gecko_loc, options=self.options)
+                    if self.metrics is not None:
+                        self.metrics.observe("launch", time.perf_counter() - start)
+                    self.__count_calls(driver)
+                    self.__driver = driver
+        return self.__driver
+
+    def __count_calls(self, driver: webdriver.Firefox) -> None:
+        """
+        Count and time every command sent to the browser, and give the
+        control channel a chance to pause or cancel before each one.
+        Everything (find_element, execute_script, clicks on elements...)
+        goes through WebDriver.execute, so that's the one place to hook.
+        """
+        execute = driver.execute
+
+        def counted(command: str, params: dict | None = None) -> dict:
+            if command != Command.QUIT:  # Cancelling has to be able to quit
+                self.control.check()
+            self.calls += 1
+            if self.metrics is None:
+                return execute(command, params)
+            self.metrics.count("webdriver_calls")
+            with self.metrics.timer("webdriver." + command):
+                return execute(command, params)
+        driver.execute = counted  # type:ignore
+
+    @timed("login")
     def login(self, uname: str, passw: str) -> None:
         """Login to cognos. This class does not store login information"""
         self.logger.debug("Navigating to cognos")
-        self.driver.get("https://cognos-prod.ec.sou.edu/ibmcognos11/bi")
+        self.driver.get(self.base_url)
 
         WebDriverWait(self.driver, 60).until(
             EC.title_is("IBM Cognos Analytics"))
@@ -107,13 +204,8 @@ class SeleniumDriver():
 
         self.logger.info("Successfully logged in")
 
-        # Just some housekeeping in preparation for the next step.
-        self.nodes_queued = 0
-        self.nodes_read = 0
-
-    def open_slider(self) -> None:
-        """Open the cognos slider for the correct area"""
-        # disable all animations with css.
+    def disable_animations(self) -> None:
+        """Disable all animations on the current page with css."""
         # Technically we only need the -moz property
         # and maybe the blank property. It doesn't hurt to add the other ones
         # Just in case we switch from firefox to e.g. chrome or edge.
@@ -126,48 +218,32 @@ class SeleniumDriver():
                                    "transition-property: none !important;}"
                                    "</style>')")
 
+    @timed("open_slider")
+    def open_slider(self) -> None:
+        """Open the cognos slider for the correct area"""
+        self.disable_animations()
+
         WebDriverWait(self.driver, 60).until(
-            EC.url_changes("https://cognos-prod.ec.sou.edu/ibmcognos11/bi/")
+            EC.url_changes(self.base_url+"/")
         )
         if self.loc == ".public_folders%2F":
             WebDriverWait(self.driver, 60).until(
                 EC.visibility_of_element_located((By.ID, 'com.ibm.bi.contentApps.teamFoldersSlideout')))
 
-            try:
-                self.driver.find_element(
-                    By.ID, 'com.ibm.bi.contentApps.teamFoldersSlideout').click()
-            # Somet`i`mes the element is obscured. Often waiting 3 seconds works.
-            except ElementNotInteractableException as e:
-                time.sleep(3)
-                try:
-                    self.driver.find_element(
-                        By.ID, 'com.ibm.bi.contentApps.teamFoldersSlideout').click()
-                # If not, something is funky
-                except ElementNotInteractableException:
-                    self.logger.error("Could not click on Teams Slideout.")
-                    raise e
+            self.__click_slideout('com.ibm.bi.contentApps.teamFoldersSlideout',
+                                  "Teams Slideout")
 
             WebDriverWait(self.driver, 60).until(
                 EC.element_to_be_clickable((By.XPATH, '//div[@id="teamFoldersSlideoutContent"]')))
             self.pane = self.driver.find_element(
                 By.XPATH, '//div[@id="teamFoldersSlideoutContent"]')
 
-        elif self.loc == ".my_folders%2f":
+        elif self.loc == ".my_folders%2F":
             WebDriverWait(self.driver, 60).until(
                 EC.element_to_be_clickable((By.ID, 'com.ibm.bi.contentApps.myContentFoldersSlideout')))
 
-            try:
-                self.driver.find_element(
-                    By.ID, 'com.ibm.bi.contentApps.myContentFoldersSlideout').click()
-            except ElementNotInteractableException as e:
-                time.sleep(3)
-                try:
-                    self.driver.find_element(
-                        By.ID, 'com.ibm.bi.contentApps.myContentFoldersSlideout').click()
-                except ElementNotInteractableException:
-                    self.logger.error(
-                        "Could not click on My Content Slideout.")
-                    raise e
+            self.__click_slideout('com.ibm.bi.contentApps.myContentFoldersSlideout',
+                                  "My Content Slideout")
 
             WebDriverWait(self.driver, 60).until(
                 EC.element_to_be_clickable((By.XPATH, '//div[@id="myContentSlideoutContent"]')))
@@ -177,6 +253,60 @@ class SeleniumDriver():
         WebDriverWait(self.driver, 60).until(
             EC.presence_of_element_located((By.CLASS_NAME, "dataTables_scrollBody")))
 
+    def __click_slideout(self, button_id: str, name: str) -> None:
+        """
+        Click a slideout button. Sometimes the element is obscured,
+        so keep trying until it takes instead of sleeping and hoping.
+        """
+        attempts = 0
+
+        def click(driver: webdriver.Firefox) -> bool:
+            nonlocal attempts
+            attempts += 1
+            driver.find_element(By.ID, button_id).click()
+            return True
+
+        start = time.perf_counter()
+        try:
+            WebDriverWait(self.driver, 60, poll_frequency=.1,
+                          ignored_exceptions=[ElementNotInteractableException,
+                                              ElementClickInterceptedException]
+                          ).until(click)
+        # If it never takes, something is funky
+        except TimeoutException:
+            self.logger.error(f"Could not click on {name}.")
+            raise ElementNotInteractableException(f"{name} never became clickable")
+        # The old code slept 3 seconds whenever the first click missed
+        self.__record_wait("slider", start, 3 if attempts > 1 else 0)
+
+    def arm(self) -> int:
+        """
+        Make sure the readiness MutationObserver is installed
+        and return how many changes it has seen so far.
+        Call this before doing something that changes folders.
+        """
+        return self.driver.execute_script(readiness.OBSERVER_SCRIPT)
+
+    def wait_for_folder(self, armed_at: int = -1, kind: str = "travel",
+                        baseline: float = 0) -> None:
+        """Wait until the pane has settled on the listing for self.path"""
+        start = time.perf_counter()
+        WebDriverWait(self.driver, 60, poll_frequency=.05).until(
+            readiness.FolderReady(self.pane_id,
+                                  self.path[-1] if self.path else "",
+                                  armed_at))
+        self.__record_wait(kind, start, baseline)
+
+    def __record_wait(self, kind: str, start: float, baseline: float) -> None:
+        """Log and keep track of how long a readiness wait took"""
+        seconds = time.perf_counter() - start
+        self.waits.record(kind, seconds, baseline)
+        if self.metrics is not None:
+            self.metrics.observe("wait." + kind, seconds)
+        if self.governor is not None:
+            self.governor.observe(seconds)
+        self.logger.debug("%s ready after %.0f ms", kind, 1000*seconds)
+
     def click_elem_by_xpath(self, xpath: str) -> None:
         """
         Try to click anelement using an xpath and js to accomplish it. 
@@ -188,51 +318,148 @@ class SeleniumDriver():
         self.driver.execute_script(
             f"document.evaluate('{xpath}',document,null,XPathResult.FIRST_ORDERED_NODE_TYPE,null).singleNodeValue.click()")
 
-    def readCurrentFolder(self) -> Generator[FolderElem | list[FolderElem], None, None]:
+    @timed("list_folder")
+    def list_folder(self, path: List[str]) -> tuple[List[FolderElem], List[FolderElem]]:
         """
-        Yields each element in the current folder. At the end, either:
-           - yield a list of folders this folder contains, or
-           - yield the folder itself, if it's empty
+        Travel to a (global) folder and read all of it at once.
+        Returns the rows to record and the subfolders to visit.
+        The traversal keeps the node counters, so several drivers can
+        share one. After a folder fails, the next one is loaded fresh
+        from its pathRef.
         """
-        tmp_elements: List[WebElement] = self.pane.find_elements(
-            By.XPATH, './/tr[@data-name]')
-
-        #Case: The folder is empty. 
-        if not tmp_elements:
+        try:
+            if self.lost:
+                self.load_path(path)
+            else:
+                self.goto(path)
+            rows = self.read_rows()
+        except WebDriverException:
+            self.lost = True
+            raise
+
+        if not rows:
             self.logger.warning(f"Found an empty folder: {self.path}")
-            yield FolderElem(FolderElem.ElemType.Empty_Folder, self.path[-1], self.path)
-            return #And we're done. 
-
-        self.nodes_queued += len(tmp_elements)
-        folder_elements:List[FolderElem] = []
+            return [FolderElem(FolderElem.ElemType.Empty_Folder,
+                               self.path[-1], self.path)], []
+
+        files: List[FolderElem] = []
+        folders: List[FolderElem] = []
+        for name, title in rows:
+            elem = self.__elem_from_row(name, title)
+            if elem.type == FolderElem.ElemType.Folder:
+                folders.append(elem)
+            else:
+                files.append(elem)
+        return files, folders
+
+    @timed("read_rows")
+    def read_rows(self) -> List[tuple[str, str]]:
+        """
+        Get (data-name, type title) for every row in the current folder.
+        When bulk_read is set, the Harvester reads them a chunk per
+        execute_script call (just the one for a folder that fits on screen)
+        and waits out the DataTable's lazy loading. Falls back to asking
+        for each row separately if the script doesn't work out on this folder.
+        Once the harvester has pruned rows from the DOM, there's nothing
+        left to fall back on, so a failure fails the folder instead.
+        """
+        if self.bulk_read:
+            harvester = Harvester(self.driver, self.pane)
+            try:
+                rows = harvester.harvest()
+                if self.metrics is not None:
+                    self.metrics.observe("harvest_chunks", harvester.chunks, CALLS)
+                    self.metrics.count("harvest_duplicates", harvester.duplicates)
+                self.__folder_read()
+                return rows
+            except WebDriverException as e:
+                if isinstance(e, JavascriptException):
+                    # The script doesn't work on this cognos. Don't keep trying it.
+                    self.logger.warning("Bulk row read doesn't work here: %s", e.msg)
+                    self.bulk_read = False
+                if harvester.pruned:
+                    raise
+                self.logger.warning("Bulk row read failed, reading this folder's"
+                                    " rows one by one: %s", e.msg)
+                if self.metrics is not None:
+                    self.metrics.count("bulk_read_fallbacks")
+
+        rows: List[tuple[str, str]] = []
         # grabs team_pane rows with data-names. (This should isolate it to data rows)
-        for element in tmp_elements:
-            if self.cancel:
-                raise src.exceptions.EarlyLeaveException  # start screaming
-            elem = FolderElem(FolderElem.ElemType
-                              .from_type(element.find_element(By.XPATH,
-                                                              './td/div[@title and @role="img"]')
-                                         .get_attribute("title")),  # type
-                              element.get_attribute("data-name"),  # title
-                              self.path
-                              )
-            elem.link = self.linkpath + "/".join(self.path+[elem.name])
-
-            self.logger.info("%s: %s", elem.type.name, elem.name)
-            self.logger.log(LINK, "link: %s", elem.link)
-
-            #immediately yield it if it's not a folder
-            if elem.type != FolderElem.ElemType.Folder:
-                self.nodes_queued -= 1
-                yield elem  # return the element
-                self.nodes_read += 1
-            else: #If it *is* a folder, append it to the list of folders
-                folder_elements.append(elem)
-        yield folder_elements
-        return
+        for element in self.pane.find_elements(By.XPATH, './/tr[@data-name]'):
+            self.control.check()
+            rows.append((element.get_attribute("data-name"),
+                         element.find_element(By.XPATH,
+                                              './td/div[@title and @role="img"]')
+                         .get_attribute("title")))
+        self.__folder_read()
+        return rows
+
+    def __folder_read(self) -> None:
+        """Count a folder, and the browser commands it took to get and read it"""
+        if self.metrics is not None:
+            self.metrics.count("folders")
+            self.metrics.observe("webdriver_calls_per_folder",
+                                 self.calls - self.__calls_at_folder, CALLS)
+        self.__calls_at_folder = self.calls
+
+    def __elem_from_row(self, name: str, title: str) -> FolderElem:
+        """Build a FolderElem out of a row in the current folder"""
+        elem = FolderElem(FolderElem.ElemType.from_type(title),  # type
+                          name,  # title
+                          self.path,
+                          linkbase=self.linkpath
+                          )
+
+        self.logger.info("%s: %s", elem.type.name, elem.name)
+        self.logger.log(LINK, "link: %s", elem.link)
+        return elem
+
+    def goto(self, path: List[str]) -> None:
+        """
+        Travel to a particular (global) folder given as a list of names.
+        Only climbs as far as the deepest folder shared with the current path.
+        """
+        if self.direct_nav:
+            if path != self.path:
+                self.load_path(path)
+            return
+        common = 0
+        while (common < min(len(self.path), len(path))
+               and self.path[common] == path[common]):
+            common += 1
+        for _ in range(len(self.path) - common):
+            self.travel("..")
+        for folder in path[common:]:
+            self.travel(folder)
 
+    @timed("load_path")
+    def load_path(self, path: List[str]) -> None:
+        """
+        Load a (global) folder straight from its pathRef URL
+        and wait for its listing to show up.
+        """
+        self.logger.log(PATHREF, "Loading %s", path)
+        self.driver.get(self.linkpath + quote("/".join(path), safe=""))
+        self.path = list(path)
+
+        # This is a fresh page, so redo the housekeeping from open_slider
+        WebDriverWait(self.driver, 60).until(
+            EC.presence_of_element_located((By.ID, self.pane_id)))
+        self.disable_animations()
+        self.pane = self.driver.find_element(By.ID, self.pane_id)
+        self.arm()
+        self.enableScrollToBottom()
+        self.wait_for_folder(kind="load")
+        self.lost = False
+
+    @timed("travel_path")
     def travel_path(self, path: str) -> None:
         """Travel to a particular (global) folder. """
+        if self.direct_nav:
+            self.goto(self.path + [folder for folder in path.strip("/ ").split("/")
+                                   if folder])
+            return
         for folder in path.strip("/ ").split("/"):
             print("Traveling to:", folder)
             self.travel(folder)
@@ -250,24 +477,61 @@ class SeleniumDriver():
             """
         self.driver.execute_script(script)
 
+    @timed("travel")
     def travel(self, folder: str) -> FolderElem:
         """
         Make selenium travel to a particular (local) folder.
         Traveling globally isn't implemented. 
         """
+        armed_at = self.arm()
         if (folder == ".."):
             self.click_elem_by_xpath(
                 './/ul[@class="breadcrumbPrevious"]//div[@role="button"]')
             self.path.pop()
         elif (folder not in ['', '.']):
             self.pane.find_element(By.XPATH, f'.//tr[td/div/@title="Folder"'
-                                   ' and @data-name="{folder}"]'
+                                   f' and @data-name="{folder}"]'
                                              '//div[@role="link"]').click()
             self.path.append(folder)
-        time.sleep(.8)
+        else:
+            return self.__here()
+        self.wait_for_folder(armed_at, baseline=.8)
+        return self.__here()
+
+    def __here(self) -> FolderElem:
+        """The folder we're currently in"""
         if (not self.path):
             return FolderElem(FolderElem.ElemType.Folder, '/', [])
 
         return FolderElem(FolderElem.ElemType.Folder,
                           self.path[-1],
                           self.path[:-1])
+
+    def healthy(self) -> bool:
+        """Is the browser still up, and still showing a logged in page?"""
+        if self.__quit or self.__driver is None:
+            return False
+        try:
+            return bool(self.__driver.execute_script(
+                "return document.getElementById(arguments[0]) !== null",
+                self.pane_id))
+        # Cancelled runs don't get to hand their browsers on
+        except (WebDriverException, src.exceptions.EarlyLeaveException):
+            return False
+
+    @timed("reset")
+    def reset(self, my_loc: str) -> None:
+        """
+        Get a logged in browser left over from another run ready for a new one:
+        load the top of my_loc's slider by pathRef instead of logging in again.
+        """
+        self.relocate(my_loc)
+        self.waits = readiness.WaitStats()
+        self.load_path([])
+
+    def quit(self) -> None:
+        """Close the browser, if it was ever started"""
+        with self.__launch_lock:
+            self.__quit = True
+            if self.__driver is not None:
+                self.__driver.quit()
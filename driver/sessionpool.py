@@ -0,0 +1,73 @@
+"""
+Keep logged in browsers around between runs instead of starting over each time.
+"""
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Hashable, List
+
+if TYPE_CHECKING:
+    from src.driver.seleniumdriver import SeleniumDriver
+
+
+class SessionPool():
+    """
+    Idle, logged in browsers, keyed by whatever has to match for one to be
+    reused (the crawler uses its firefox, headless, cognos and user settings).
+    Browsers are health checked on the way in and out, and ones left idle
+    longer than idle_timeout seconds, or beyond the first size, are quit.
+    """
+
+    def __init__(self, logger: logging.Logger, size: int = 4,
+                 idle_timeout: float = 900):
+        self.logger = logger
+        self.size = size
+        self.idle_timeout = idle_timeout
+        # (key, idle since, browser), oldest first
+        self.idle: List[tuple[Hashable, float, "SeleniumDriver"]] = []
+        self.__lock = threading.Lock()
+
+    def acquire(self, key: Hashable) -> "SeleniumDriver | None":
+        """A healthy browser for key, or None if there isn't one"""
+        self.__expire()
+        while True:
+            with self.__lock:
+                matches = [entry for entry in self.idle if entry[0] == key]
+                if not matches:
+                    return None
+                entry = matches[-1]  # The most recently used is likeliest alive
+                self.idle.remove(entry)
+            driver = entry[2]
+            if driver.healthy():
+                self.logger.info("Reusing a browser that's already logged in")
+                return driver
+            self.logger.debug("Dropping a pooled browser that stopped responding")
+            driver.quit()
+
+    def release(self, key: Hashable, driver: "SeleniumDriver") -> None:
+        """Keep a browser for later, if it's still any good"""
+        if not driver.healthy():
+            driver.quit()
+            return
+        with self.__lock:
+            self.idle.append((key, time.monotonic(), driver))
+            extra = self.idle[:-self.size] if len(self.idle) > self.size else []
+            del self.idle[:len(extra)]
+        for _, _, old in extra:
+            old.quit()
+
+    def __expire(self) -> None:
+        """Quit the browsers that have been idle too long"""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self.__lock:
+            expired = [entry for entry in self.idle if entry[1] < cutoff]
+            self.idle = [entry for entry in self.idle if entry[1] >= cutoff]
+        for _, _, driver in expired:
+            driver.quit()
+
+    def close(self) -> None:
+        """Quit every idle browser"""
+        with self.__lock:
+            idle, self.idle = self.idle, []
+        for _, _, driver in idle:
+            driver.quit()
@@ -0,0 +1,252 @@
+"""
+Split a crawl across several processes (or machines) by the start
+folder's subfolders, and merge what they write back into one workbook.
+"""
+import json
+import logging
+import os
+import statistics
+import subprocess
+import time
+from typing import Callable, List
+
+from src.driver.folderelem import FolderElem
+from src.driver.sinks import Sink
+
+
+class Shard():
+    """
+    One subtree of a crawl, the files its worker writes, and how it went.
+    A shard made of what another left over has those folders (as paths
+    from the content root) and the settings of the crawl they came from.
+    Its worker resumes a checkpoint of them rather than starting at
+    travel_path.
+    """
+
+    def __init__(self, number: int, travel_path: str, directory: str,
+                 attempt: int = 0, folders: List[List[str]] | None = None,
+                 settings: dict | None = None):
+        self.number = number
+        self.travel_path = travel_path
+        self.attempt = attempt  # How many times this subtree failed before
+        self.folders = folders or []
+        self.settings = settings or {}
+        base = os.path.join(directory, f"shard-{number:03}")
+        self.export = base + ".xlsx"
+        # Where the worker checkpoints, and what it resumes if there are folders
+        self.checkpoint = self.export + ".checkpoint"
+        self.resume = self.checkpoint if self.folders else ""
+        self.output = base + ".jsonl"  # What the merge reads
+        self.manifest = base + ".manifest.json"
+        self.stop_file = base + ".stop"
+        self.log = base + ".log"
+        self.status = "queued"  # then running, and done, split or failed
+        self.splitting = False
+        self.splittable = True
+        self.process: subprocess.Popen | None = None
+        self.started = 0.0
+        self.seconds = 0.0
+        self.rows = 0
+
+    def to_dict(self) -> dict:
+        return {"number": self.number, "travel_path": self.travel_path,
+                "folders": len(self.folders),
+                "status": self.status, "rows": self.rows,
+                "seconds": self.seconds, "output": self.output,
+                "manifest": self.manifest}
+
+
+# The command line that runs a shard
+Command = Callable[[Shard], List[str]]
+
+
+class Coordinator():
+    """
+    Run shards on up to workers processes at once, in the order they were
+    added. Each worker is a batch crawl of its shard's travel path (see
+    cli.shard_command) that writes its rows to shard.output and a
+    manifest saying how it went.
+
+    Folders vary a lot in size, so one shard can still be going long after
+    the rest are done. When a worker is free and nothing is queued, the
+    shard that has run longest (at least split_after seconds, and
+    split_factor times the typical finished shard) is told to stop through
+    its stop file. Its checkpoint says which folders it hadn't got to, and
+    those are shared out between at most workers new shards, so a split
+    never means more logins than there are workers. A shard that fails is
+    split the same way, up to retries times.
+    """
+
+    def __init__(self, logger: logging.Logger, command: Command,
+                 workers: int, directory: str, retries: int = 1,
+                 split_after: float = 60, split_factor: float = 3,
+                 poll: float = .5):
+        self.logger = logger
+        self.command = command
+        self.workers = workers
+        self.directory = directory
+        self.retries = retries
+        self.split_after = split_after
+        self.split_factor = split_factor
+        self.poll = poll
+        self.shards: List[Shard] = []
+        self.queue: List[Shard] = []
+        self.running: List[Shard] = []
+        os.makedirs(directory, exist_ok=True)
+
+    def add(self, travel_path: str, attempt: int = 0, first: bool = False,
+            folders: List[List[str]] | None = None,
+            settings: dict | None = None) -> Shard:
+        """Queue a subtree to crawl, at the back or (first) at the front"""
+        shard = Shard(len(self.shards), travel_path, self.directory, attempt,
+                      folders, settings)
+        self.shards.append(shard)
+        if first:
+            self.queue.insert(0, shard)
+        else:
+            self.queue.append(shard)
+        return shard
+
+    def run(self) -> bool:
+        """Crawl every shard. Returns whether all of them made it."""
+        while self.queue or self.running:
+            for shard in list(self.running):
+                if shard.process is not None and shard.process.poll() is not None:
+                    self.running.remove(shard)
+                    self.__reap(shard)
+            while self.queue and len(self.running) < self.workers:
+                self.__launch(self.queue.pop(0))
+            self.__rebalance()
+            time.sleep(self.poll)
+        return all(shard.status in ("done", "split") for shard in self.shards)
+
+    def __launch(self, shard: Shard) -> None:
+        for filename in (shard.stop_file, shard.manifest):
+            if os.path.exists(filename):
+                os.remove(filename)
+        if shard.folders:
+            # Same format as checkpoint.Checkpoint, with nothing read yet
+            with open(shard.checkpoint, "w", encoding="utf-8") as file:
+                json.dump({"settings": shard.settings,
+                           "frontier": shard.folders, "rows": 0}, file)
+            open(shard.checkpoint + ".rows", "w").close()
+            self.logger.info("Shard %d: crawling %d folders under %s", shard.number,
+                             len(shard.folders), shard.travel_path)
+        else:
+            self.logger.info("Shard %d: crawling %s", shard.number, shard.travel_path)
+        with open(shard.log, "w", encoding="utf-8") as log:
+            shard.process = subprocess.Popen(self.command(shard), stdout=log,
+                                             stderr=subprocess.STDOUT,
+                                             stdin=subprocess.DEVNULL)
+        shard.status = "running"
+        shard.started = time.monotonic()
+        self.running.append(shard)
+
+    def __reap(self, shard: Shard) -> None:
+        """Deal with a worker that has exited"""
+        shard.seconds = time.monotonic() - shard.started
+        manifest: dict = {}
+        if os.path.exists(shard.manifest):
+            with open(shard.manifest, encoding="utf-8") as file:
+                manifest = json.load(file)
+        shard.rows = manifest.get("rows", 0)
+        if manifest.get("finished"):
+            shard.status = "done"
+            self.logger.info("Shard %d: %d rows in %.0f s",
+                             shard.number, shard.rows, shard.seconds)
+            return
+
+        failed = not shard.splitting
+        attempt = shard.attempt + failed
+        if failed and attempt > self.retries:
+            shard.status = "failed"
+            self.logger.error("Shard %d (%s) failed. See %s",
+                              shard.number, shard.travel_path, shard.log)
+            return
+        shard.status = "split"
+        # What it had done is in its output. Crawl what it hadn't.
+        checkpoint = manifest.get("checkpoint", "")
+        if not checkpoint or not os.path.exists(checkpoint):
+            # Nothing to go on, so the whole shard again
+            self.add(shard.travel_path, attempt, True, shard.folders,
+                     shard.settings).splittable = failed
+            self.logger.info("Shard %d %s after %d rows, with no checkpoint. "
+                             "Crawling it again", shard.number,
+                             "failed" if failed else "was split", shard.rows)
+            return
+        with open(checkpoint, encoding="utf-8") as file:
+            state = json.load(file)
+        left = state["frontier"]
+        # Stopped before it got anywhere: don't go round in circles
+        started = shard.folders or [[name for name in shard.travel_path.split("/")
+                                     if name]]
+        splittable = failed or left != started
+        count = min(self.workers, len(left))
+        for group in reversed(range(count)):
+            self.add(shard.travel_path, attempt, True, left[group::count],
+                     state["settings"]).splittable = splittable
+        self.logger.info("Shard %d %s after %d rows. Its %d remaining folders "
+                         "are in %d new shards", shard.number,
+                         "failed" if failed else "was split", shard.rows,
+                         len(left), count)
+
+    def __rebalance(self) -> None:
+        """Split the slowest shard if a worker would otherwise sit idle"""
+        idle = self.workers - len(self.running) - len(self.queue)
+        splitting = sum(shard.splitting for shard in self.running)
+        if idle - splitting <= 0:
+            return
+        finished = [shard.seconds for shard in self.shards if shard.status == "done"]
+        typical = statistics.median(finished) if finished else 0
+        now = time.monotonic()
+        candidates = [shard for shard in self.running
+                      if shard.splittable and not shard.splitting
+                      and now - shard.started >= max(self.split_after,
+                                                     self.split_factor*typical)]
+        if not candidates:
+            return
+        shard = min(candidates, key=lambda shard: shard.started)
+        self.logger.info("Shard %d (%s) has run for %.0f s. Splitting it up",
+                         shard.number, shard.travel_path, now - shard.started)
+        shard.splitting = True
+        open(shard.stop_file, "w").close()
+
+    def outputs(self) -> List[str]:
+        """
+        The partial outputs to merge. Split and failed shards count too:
+        every row a worker wrote is a real one.
+        """
+        return [shard.output for shard in self.shards
+                if shard.status in ("done", "split", "failed")]
+
+    def write_manifest(self, filename: str, summary: dict) -> None:
+        """Write what became of every shard, along with summary"""
+        with open(filename + ".tmp", "w", encoding="utf-8") as file:
+            json.dump({**summary,
+                       "shards": [shard.to_dict() for shard in self.shards]},
+                      file, indent=1)
+        os.replace(filename + ".tmp", filename)
+
+
+def merge(partials: List[str], output: Sink) -> int:
+    """
+    Combine jsonl partial outputs into output, sorted by path and then
+    name. A split shard and the shards it was split into can both have
+    the rows of the folder it stopped in, so duplicate rows are dropped.
+    Returns how many rows were written.
+    """
+    rows = set()
+    for filename in partials:
+        if not os.path.exists(filename):
+            continue
+        with open(filename, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # The last line of a worker that died writing it
+                rows.add((row["path"], row["name"], row["type"], row["link"]))
+    for path, name, type, link in sorted(rows):
+        output.append(FolderElem(FolderElem.ElemType[type], name, path, link))
+    output.finalize()
+    return len(rows)
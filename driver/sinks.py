@@ -0,0 +1,202 @@
+"""
+Places to send the rows of a crawl besides (or as well as) an excel file.
+"""
+import abc
+import csv
+import json
+import os
+import sqlite3
+from typing import IO, List
+
+from src.driver.folderelem import FolderElem
+
+HEADERS = ["Path", "File", "Type", "Description", "Link"]
+
+
+class Sink(abc.ABC):
+    """
+    Somewhere rows go. append() each row as it's found,
+    then finalize() once the crawl is over.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.closed = False
+        self.rows = 0
+
+    @abc.abstractmethod
+    def append(self, listing: FolderElem) -> None: ...
+
+    def finalize(self) -> None:
+        self.closed = True
+
+
+class CsvSink(Sink):
+    """Write rows to a csv with the same columns as the excel file"""
+
+    def __init__(self, filename: str):
+        super().__init__(filename)
+        self.file: IO[str] = open(filename, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(HEADERS)
+
+    def append(self, listing: FolderElem) -> None:
+        self.writer.writerow([listing.path, listing.name,
+                              listing.type.name, "", listing.link])
+        self.rows += 1
+
+    def finalize(self) -> None:
+        self.file.close()
+        super().finalize()
+
+
+class JsonlSink(Sink):
+    """Write rows as newline delimited json objects"""
+
+    def __init__(self, filename: str):
+        super().__init__(filename)
+        self.file: IO[str] = open(filename, "w", encoding="utf-8")
+
+    def append(self, listing: FolderElem) -> None:
+        self.file.write(json.dumps({"path": listing.path,
+                                    "name": listing.name,
+                                    "type": listing.type.name,
+                                    "link": listing.link}) + "\n")
+        self.rows += 1
+
+    def finalize(self) -> None:
+        self.file.close()
+        super().finalize()
+
+
+class SqliteSink(Sink):
+    """Write rows to a table in a sqlite database, replacing what was there"""
+
+    def __init__(self, filename: str, table: str = "listing",
+                 batch_size: int = 1000):
+        super().__init__(filename)
+        self.table = table
+        self.batch_size = batch_size
+        self.batch: List[tuple[str, str, str, str]] = []
+        self.db = sqlite3.connect(filename, check_same_thread=False)
+        self.db.execute(f'DROP TABLE IF EXISTS "{table}"')
+        self.db.execute(f'CREATE TABLE "{table}" '
+                        '(path TEXT, name TEXT, type TEXT, link TEXT)')
+
+    def append(self, listing: FolderElem) -> None:
+        self.batch.append((listing.path, listing.name,
+                           listing.type.name, listing.link))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self.db.executemany(f'INSERT INTO "{self.table}" VALUES (?, ?, ?, ?)',
+                            self.batch)
+        self.db.commit()
+        self.rows += len(self.batch)
+        self.batch.clear()
+
+    def finalize(self) -> None:
+        self.flush()
+        self.db.close()
+        super().finalize()
+
+
+class ParquetSink(Sink):
+    """
+    Write rows to a parquet file in row groups of batch_size.
+    Needs pyarrow, which isn't otherwise a dependency.
+    """
+
+    def __init__(self, filename: str, batch_size: int = 10000):
+        super().__init__(filename)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Writing parquet files needs pyarrow "
+                              "(pip install pyarrow)") from e
+        self.pa = pyarrow
+        self.schema = pyarrow.schema([(name, pyarrow.string()) for name in
+                                      ["path", "name", "type", "link"]])
+        self.writer = pyarrow.parquet.ParquetWriter(filename, self.schema)
+        self.batch_size = batch_size
+        self.batch: List[FolderElem] = []
+
+    def append(self, listing: FolderElem) -> None:
+        self.batch.append(listing)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.batch:
+            return
+        self.writer.write_table(self.pa.table({
+            "path": [elem.path for elem in self.batch],
+            "name": [elem.name for elem in self.batch],
+            "type": [elem.type.name for elem in self.batch],
+            "link": [elem.link for elem in self.batch]}, schema=self.schema))
+        self.rows += len(self.batch)
+        self.batch.clear()
+
+    def finalize(self) -> None:
+        self.flush()
+        self.writer.close()
+        super().finalize()
+
+
+class MultiSink(Sink):
+    """Send every row to several sinks at once"""
+
+    def __init__(self, sinks: List[Sink]):
+        super().__init__("")
+        self.sinks = sinks
+
+    def append(self, listing: FolderElem) -> None:
+        for sink in self.sinks:
+            sink.append(listing)
+        self.rows += 1
+
+    def finalize(self) -> None:
+        """
+        Finalize every sink not finalized yet. One failing doesn't stop
+        the rest being saved. The first error is raised once they're done.
+        """
+        error: Exception | None = None
+        for sink in self.sinks:
+            if sink.closed:
+                continue
+            try:
+                sink.finalize()
+            except Exception as e:
+                error = error or e
+        super().finalize()
+        if error is not None:
+            raise error
+
+
+SINKS = {"csv": CsvSink,
+         "jsonl": JsonlSink,
+         "sqlite": SqliteSink,
+         "parquet": ParquetSink}
+
+
+def make_sink(spec: str) -> Sink:
+    """
+    Make a sink from FORMAT:FILENAME, e.g. csv:out.csv.
+    The format can be left off if the extension gives it away.
+    """
+    format, _, filename = spec.partition(":")
+    # Windows paths have colons in them too
+    if not filename or len(format) == 1:
+        format, filename = os.path.splitext(spec)[1].lstrip("."), spec
+    format = {"db": "sqlite", "sqlite3": "sqlite", "json": "jsonl",
+              "ndjson": "jsonl", "pq": "parquet"}.get(format.lower(),
+                                                      format.lower())
+    if format == "xlsx":
+        from src.driver.excelwriter import StreamingExcelWriter
+        return StreamingExcelWriter(filename)
+    if format not in SINKS:
+        raise ValueError(f"Don't know how to write {spec}. "
+                         f"Try one of {', '.join(['xlsx', *SINKS])}")
+    return SINKS[format](filename)
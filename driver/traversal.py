@@ -0,0 +1,286 @@
+"""
+Walking the cognos tree with asyncio: as many folders in flight
+as there are listing sessions to read them.
+"""
+import asyncio
+import csv
+import http.client
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Protocol, TypeVar
+
+from src.driver.control import CANCELLED, PAUSED, ControlChannel
+from src.driver.folderelem import FolderElem
+from src.exceptions import EarlyLeaveException, StateException
+from src.logs import *
+
+if TYPE_CHECKING:
+    from src.driver.listingindex import ListingIndex
+
+T = TypeVar("T")
+
+
+class Lister(Protocol):
+    """Anything that can list a (global) folder. SeleniumDriver is one."""
+
+    def list_folder(self, path: List[str]) \
+            -> tuple[List[FolderElem], List[FolderElem]]: ...
+
+
+# Called after every finished folder with the folders still left to read
+FolderDone = Callable[[List[List[str]]], None]
+# Where the rows end up
+Sink = Callable[[FolderElem], None]
+# How a folder read fails when cognos doesn't answer properly: dropped
+# connections, error statuses and garbled replies. SeleniumDriver adds
+# WebDriverException. Anything else is a bug, and stops the crawl.
+READ_ERRORS: tuple[type[Exception], ...] = (
+    OSError, http.client.HTTPException, json.JSONDecodeError, StateException)
+
+
+def message(error: Exception) -> str:
+    """The first line of an exception's message. Selenium's come with a stack trace."""
+    lines = str(error).strip().splitlines()
+    return lines[0] if lines else ""
+
+
+def describe(error: Exception) -> str:
+    return f"{type(error).__name__}: {message(error)}"
+
+
+class AsyncLister():
+    """
+    The async face of a Lister. The drivers block, so each call runs on
+    a thread of the traversal's executor while the event loop carries on.
+    """
+
+    def __init__(self, lister: Lister, executor: ThreadPoolExecutor):
+        self.lister = lister
+        self.executor = executor
+
+    async def list_folder(self, path: List[str]) \
+            -> tuple[List[FolderElem], List[FolderElem]]:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.lister.list_folder, path)
+
+
+class AsyncTraverser():
+    """
+    Walk a subtree with one session coroutine per lister, all sharing
+    one stack of folders to read. A driver that can list several folders
+    at once (HttpDriver) is simply passed in several times.
+
+    Listings come back through a bounded queue to the consumer, which
+    does all of the bookkeeping and hands the rows to the sink. Sessions
+    wait on a full queue, so a slow sink (or a paused crawl) holds the
+    listing back instead of piling rows up in memory.
+
+    The crawl is paused and cancelled through control. Paused, no new
+    folder is started and no row reaches the sink (the listers stop at
+    their next WebDriver call or request on their own). Cancelled,
+    crawl() raises EarlyLeaveException.
+
+    A folder that can't be read (the read raised one of read_errors) goes
+    back on the stack to be tried again, up to retries more times, and is then quarantined: the rest of the
+    crawl carries on without it. Quarantined folders stay in the frontier
+    handed to on_folder, so resuming the checkpoint tries them again.
+    A session that fails on retire_after folders in a row stops taking
+    folders (unless it's the last one), and give_up_after quarantined
+    folders in a row mean cognos itself is in trouble, so crawl() raises.
+    Any other exception from a lister is raised by crawl() straight away.
+    """
+
+    def __init__(self, logger: logging.Logger,
+                 listers: List[Lister],
+                 frontier: List[List[str]],
+                 control: ControlChannel,
+                 on_folder: FolderDone | None = None,
+                 index: "ListingIndex | None" = None,
+                 backlog: int = 64,
+                 retries: int = 2,
+                 retire_after: int = 3,
+                 give_up_after: int = 10,
+                 read_errors: tuple[type[Exception], ...] = READ_ERRORS):
+        self.logger = logger
+        self.listers = listers
+        self.frontier = [list(path) for path in frontier]
+        self.control = control
+        self.on_folder = on_folder
+        self.index = index
+        self.backlog = backlog
+        self.retries = retries
+        self.retire_after = retire_after
+        self.give_up_after = give_up_after
+        self.read_errors = read_errors
+        # Failed tries of every folder that has failed, and the last error
+        # of each folder that failed too often to keep trying
+        self.attempts: Dict[tuple[str, ...], int] = {}
+        self.quarantine: Dict[tuple[str, ...], Exception] = {}
+        self._sessions = 0  # Sessions still taking folders
+        # Made in crawl(), on the loop that uses them
+        self._running: asyncio.Event
+        self._stop: asyncio.Event
+
+    def _update(self, state: str) -> None:
+        """Bring the loop's events in line with the control channel"""
+        if state == PAUSED:
+            self._running.clear()
+        else:
+            self._running.set()
+        if state == CANCELLED:
+            self._stop.set()
+
+    async def _unless_cancelled(self, awaitable: Awaitable[T]) -> T:
+        """Await something, but raise EarlyLeaveException if cancelled first"""
+        task = asyncio.ensure_future(awaitable)
+        stop = asyncio.ensure_future(self._stop.wait())
+        await asyncio.wait([task, stop], return_when=asyncio.FIRST_COMPLETED)
+        stop.cancel()
+        if not task.done():
+            task.cancel()
+            self.control.check(block=False)  # Acknowledges the cancel, and raises
+            raise EarlyLeaveException
+        return task.result()
+
+    async def _checkpoint(self) -> None:
+        """Somewhere safe to pause or cancel"""
+        while self.control.check(block=False):
+            await self._unless_cancelled(self._running.wait())
+
+    async def _session(self, lister: AsyncLister,
+                       work: "asyncio.LifoQueue[List[str]]",
+                       results: "asyncio.Queue[tuple[List[str], object]]") -> None:
+        """List folders off the stack until the traversal is over, or this session is no good"""
+        failed = set()  # Folders this session failed since it last read one
+        while True:
+            path = await work.get()
+            await self._checkpoint()
+            try:
+                result: object = await lister.list_folder(path)
+            except Exception as e:
+                # Let the consumer decide what to do with the folder
+                await results.put((path, e))
+                if not isinstance(e, self.read_errors):
+                    return  # Cancelled, or a bug the consumer will raise
+                failed.add(tuple(path))
+                if len(failed) >= self.retire_after and self._sessions > 1:
+                    self._sessions -= 1
+                    self.logger.warning("Dropping a session after %d folders in a row"
+                                        " failed. %d left", len(failed), self._sessions)
+                    return
+                continue
+            failed.clear()
+            await results.put((path, result))
+
+    def _failed(self, path: List[str], error: Exception,
+                work: "asyncio.LifoQueue[List[str]]") -> bool:
+        """
+        A folder couldn't be read. Put it back on the stack, or
+        quarantine it and return True if it has failed too often.
+        """
+        key = tuple(path)
+        self.attempts[key] = self.attempts.get(key, 0) + 1
+        where = "/" + "".join(name + "/" for name in path)
+        if self.attempts[key] <= self.retries:
+            self.logger.warning("Couldn't read %s (%s). Trying it again",
+                                where, describe(error))
+            work.put_nowait(path)
+            return False
+        self.logger.error("Couldn't read %s after %d tries (%s). Skipping it",
+                          where, self.attempts[key], describe(error))
+        self.quarantine[key] = error
+        return True
+
+    async def crawl(self, sink: Sink) -> None:
+        """Give every row under the frontier to sink. Folders themselves aren't."""
+        self._running = asyncio.Event()
+        self._stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        stop_listening = self.control.listen(
+            lambda state: loop.call_soon_threadsafe(self._update, state))
+        # Anything asked for before we were listening
+        self._update(self.control.state)
+
+        # A stack, so a single session walks the tree depth first
+        work: "asyncio.LifoQueue[List[str]]" = asyncio.LifoQueue()
+        results: "asyncio.Queue[tuple[List[str], object]]" = \
+            asyncio.Queue(maxsize=self.backlog)
+        executor = ThreadPoolExecutor(len(self.listers),
+                                      thread_name_prefix="JSpider_session")
+        sessions = [asyncio.create_task(
+            self._session(AsyncLister(lister, executor), work, results))
+            for lister in self.listers]
+        self._sessions = len(sessions)
+
+        # Everything queued or being listed, i.e. what's left to do
+        outstanding = {tuple(path): path for path in self.frontier}
+        for path in reversed(self.frontier):
+            work.put_nowait(path)
+        read = 0
+        in_a_row = 0  # Folders quarantined since one was last read
+        try:
+            while outstanding:
+                path, result = await self._unless_cancelled(results.get())
+                if isinstance(result, Exception) \
+                        and not isinstance(result, self.read_errors):
+                    raise result
+                if isinstance(result, Exception):
+                    if not self._failed(path, result, work):
+                        continue
+                    del outstanding[tuple(path)]
+                    in_a_row += 1
+                    if in_a_row >= self.give_up_after:
+                        raise StateException(
+                            f"{in_a_row} folders in a row couldn't be read") from result
+                    if self.on_folder:
+                        self.on_folder(self._left(outstanding))
+                    continue
+
+                in_a_row = 0
+                rows, folders = result  # type:ignore
+                if self.index:
+                    self.index.update(path, rows, folders)
+                for row in rows:
+                    await self._checkpoint()
+                    sink(row)
+                    read += 1
+                for folder in reversed(folders):
+                    self.logger.debug(f"found a folder item: {folder}")
+                    child = path + [folder.name]
+                    outstanding[tuple(child)] = child
+                    work.put_nowait(child)
+                del outstanding[tuple(path)]
+                if self.on_folder:
+                    self.on_folder(self._left(outstanding))
+
+                self.logger.log(NODESQUEUED, len(outstanding))
+                self.logger.log(NODESFINISHED, read)
+        finally:
+            for session in sessions:
+                session.cancel()
+            await asyncio.gather(*sessions, return_exceptions=True)
+            # A listing still under way can't be interrupted, and its driver
+            # mustn't go back to the pool while it's still sending commands.
+            # Wait it out. Cancelled, it stops at its next command anyway.
+            executor.shutdown(wait=True, cancel_futures=True)
+            stop_listening()
+
+    def _left(self, outstanding: Dict[tuple[str, ...], List[str]]) -> List[List[str]]:
+        """What a resumed crawl would have to read: what's outstanding, and what failed"""
+        return list(outstanding.values()) + [list(path) for path in self.quarantine]
+
+    def write_quarantine(self, filename: str) -> int:
+        """Write the folders that were skipped, and why, to a csv. Returns how many."""
+        with open(filename, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["Path", "Tries", "Error", "Message"])
+            for path, error in sorted(self.quarantine.items()):
+                writer.writerow(["/" + "".join(name + "/" for name in path),
+                                 self.attempts[path], type(error).__name__,
+                                 message(error)])
+        return len(self.quarantine)
+
+    def run(self, sink: Sink) -> None:
+        """crawl() on an event loop of its own"""
+        asyncio.run(self.crawl(sink))
@@ -1,5 +1,4 @@
 import logging
-import time
 from PyQt6 import QtCore
 from src.gui import worker, ui
 from src import exceptions
@@ -22,10 +21,15 @@ class Controller(QtCore.QObject,logging.Handler):
     #to send logs back to the parent thread
     logger = QtCore.pyqtSignal(logging.LogRecord) 
 
+    #Seconds to wait for the worker to act on a pause, and to wind down after a cancel
+    ACK_TIMEOUT = 60
+    CANCEL_TIMEOUT = 120
+
     def __init__(self,myUI:'ui.Ui',myWorker:worker.Worker):
         QtCore.QObject.__init__(self)
         logging.Handler.__init__(self)
         self.worker = myWorker
+        self.control = myWorker.crawler.control
         self.ui = myUI
         JSpider_controller.addHandler(self)
         self.__is_paused = False
@@ -34,10 +38,11 @@ class Controller(QtCore.QObject,logging.Handler):
         """Pause the worker."""
         if not self.__is_paused:
             JSpider_controller.info("Getting to a safe place...")
-            JSpider_controller.log(LOCK,"consumelock locking")
-            #Pause the worker. This method blocks until the worker is paused.
-            self.worker.consume.lock()
+            #The crawl stops before its next browser command or request
+            self.control.pause()
             self.__is_paused = True
+            if self.control.wait_acknowledged("pause", self.ACK_TIMEOUT):
+                JSpider_controller.info("Paused")
             self.ui.pauseButton.setText("Unpause")
         else:
             raise exceptions.StateException("Tried to pause a paused worker")
@@ -46,8 +51,7 @@ class Controller(QtCore.QObject,logging.Handler):
         """Unpause the worker"""
         if self.__is_paused:     #if we were the one that locked it 
             JSpider_controller.info("Unpausing")
-            self.worker.consume.unlock() #unlock it
-            JSpider_controller.log(LOCK,"consumelock unlocked")
+            self.control.unpause()
             self.__is_paused = False
             self.ui.pauseButton.setText("Pause")
         else:
@@ -68,28 +72,14 @@ class Controller(QtCore.QObject,logging.Handler):
         self.ui.cancelButton.setEnabled(False)
         self.ui.pauseButton.setEnabled(False)
 
-        self.worker.driver.cancel = True 
-        #Asynchronously pass the cancel flag to the worker's driver. 
-        #Yes, this violates thread safety. 
-        #However, the worker atomically checks the cancel flag
-        #and never alters it except at setup time. 
+        #The worker raises EarlyLeaveException at its next browser command
+        #or request, then saves what it has and closes firefox itself.
+        self.control.cancel()
+        self.__is_paused = False
+        self.ui.pauseButton.setText("Pause")
         JSpider_controller.debug("Waiting for worker to finish cascading...")
-        #Busywait for worker to finish cascading
-        while self.worker.driver.cancel: time.sleep(0.1) 
-        #When worker.run() finishes erroring out it'll set cancel to false
-        
-        #Kill firefox
-        JSpider_controller.log(LOCK,"setupLock locking")
-        self.worker.setupLock.lock()
-
-        try:
-            self.worker.driver.driver.quit()
-        #There's a chance the driver doesn't exist yet
-        except AttributeError as ex: 
-            pass
-
-        self.worker.setupLock.unlock()
-        JSpider_controller.log(LOCK,"setupLock unlocked")
+        if not self.control.wait_finished(self.CANCEL_TIMEOUT):
+            JSpider_controller.warning("Worker is taking a long time to stop")
 
     def quitUI(self)->None:
         """Kill the UI"""
@@ -98,6 +88,8 @@ class Controller(QtCore.QObject,logging.Handler):
             self.cancel()
             self.ui.work_thread.terminate()
             JSpider_controller.debug("worker killed.")
+        #Close the browsers kept warm for the next run
+        self.worker.crawler.close()
         self.finished.emit()
 
     @QtCore.pyqtSlot(Task)
@@ -1,11 +1,62 @@
+import contextlib
 from enum import Enum
-from PyQt6 import QtWidgets, QtGui
-from typing import Dict, List
+from PyQt6 import QtWidgets, QtGui, QtCore
+from typing import Dict, Generator, List, Set
+from src.gui.logstore import LogStore
 from src.logs import *
 
 
-class QPlainTextEditLogger(logging.Handler, QtWidgets.QPlainTextEdit):
-    """Log and refilter messages in a QPlainTextEdit object. """
+class LogModel(QtCore.QAbstractListModel):
+    """The lines of a LogStore at the levels being shown"""
+
+    def __init__(self, store: LogStore, parent: QtCore.QObject | None = None):
+        super().__init__(parent)
+        self.store = store
+        self.levels: Set[int] = set()
+        self.rows: List[int] = []  # Line numbers in the store, oldest first
+
+    def rowCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index: QtCore.QModelIndex,
+             role: int = QtCore.Qt.ItemDataRole.DisplayRole) -> str | None:
+        if role == QtCore.Qt.ItemDataRole.DisplayRole and index.isValid():
+            return self.store[self.rows[index.row()]]
+        return None
+
+    def add(self, numbers: List[int]) -> None:
+        """Show newly stored lines, and stop showing the ones the store dropped"""
+        first = self.store.first
+        dropped = 0
+        while dropped < len(self.rows) and self.rows[dropped] < first:
+            dropped += 1
+        if dropped:
+            self.beginRemoveRows(QtCore.QModelIndex(), 0, dropped-1)
+            del self.rows[:dropped]
+            self.endRemoveRows()
+
+        new = [number for number in numbers
+               if number >= first and self.store.level(number) in self.levels]
+        if new:
+            self.beginInsertRows(QtCore.QModelIndex(), len(self.rows),
+                                 len(self.rows)+len(new)-1)
+            self.rows.extend(new)
+            self.endInsertRows()
+
+    def refilter(self, levels: Set[int]) -> None:
+        """Show the stored lines at levels"""
+        self.beginResetModel()
+        self.levels = levels
+        self.rows = self.store.select(levels)
+        self.endResetModel()
+
+
+class QListViewLogger(logging.Handler, QtWidgets.QListView):
+    """
+    Log and refilter messages in a QListView.
+    Only the last capacity lines are kept (older ones go to the store's
+    spill file, if it has one), and only the lines on screen are drawn.
+    """
 
     class debugLevel(Enum):
         Lock = LOCK  # Custom level
@@ -18,27 +69,36 @@ class QPlainTextEditLogger(logging.Handler, QtWidgets.QPlainTextEdit):
         Critical = 50
 
         @classmethod
-        def convert(cls, value: int) -> "QPlainTextEditLogger.debugLevel":
+        def convert(cls, value: int) -> "QListViewLogger.debugLevel":
             for item in cls:
                 if item.value == value:
                     return item
             raise Exception("Could not find enum item")
 
     def __init__(self, parent: QtWidgets.QWidget | None,
-                 parent_logger: logging.Logger) -> None:
+                 parent_logger: logging.Logger,
+                 capacity: int = 100_000) -> None:
         logging.Handler.__init__(self)
-        QtWidgets.QPlainTextEdit.__init__(self, parent)
+        QtWidgets.QListView.__init__(self, parent)
         self.setFormatter(logging.Formatter("%(levelname)s:%(message)s"))
 
         # receive ALL messages. We're going to filter them ourself
         self.setLevel(0)
-        self.setReadOnly(True)
         parent_logger.addHandler(self)
 
+        self.store = LogStore(capacity)
+        self.logModel = LogModel(self.store, self)
+        self.setModel(self.logModel)
+        # Every line is the same height, so the view needn't measure them
+        self.setUniformItemSizes(True)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setSelectionMode(
+            QtWidgets.QAbstractItemView.SelectionMode.ExtendedSelection)
+
         self.rclickMenu = QtWidgets.QMenu(self)
-        self.actions: Dict[QPlainTextEditLogger.debugLevel,
+        self.actions: Dict[QListViewLogger.debugLevel,
                            QtGui.QAction] = {}
-        for item in QPlainTextEditLogger.debugLevel:
+        for item in QListViewLogger.debugLevel:
             self.actions[item] = QtGui.QAction(item.name)
             self.actions[item].setCheckable(True)
             self.actions[item].setChecked(True)
@@ -51,22 +111,54 @@ class QPlainTextEditLogger(logging.Handler, QtWidgets.QPlainTextEdit):
                      tmp.Debug,
                      tmp.Link]:
             self.actions[item].setChecked(False)
-            
-        self.messages: List[logging.LogRecord] = []
+        self.refilterLogs()
+
+        # Line numbers waiting to be shown together, while held()
+        self.__held: List[int] | None = None
 
     def contextMenuEvent(self, e: QtGui.QContextMenuEvent) -> None:
         self.rclickMenu.popup(QtGui.QCursor.pos())
 
-    def conditionalPrint(self, record: logging.LogRecord):
-        tmp = self.debugLevel.convert(record.levelno)
-        if self.actions[tmp].isChecked():
-            self.appendPlainText(self.format(record))
+    def keyPressEvent(self, e: QtGui.QKeyEvent) -> None:
+        """Copy the selected lines"""
+        if e.matches(QtGui.QKeySequence.StandardKey.Copy):
+            rows = sorted(index.row() for index in self.selectedIndexes())
+            QtWidgets.QApplication.clipboard().setText(
+                "\n".join(self.store[self.logModel.rows[row]] for row in rows))
+        else:
+            super().keyPressEvent(e)
 
     def refilterLogs(self) -> None:
-        self.setPlainText("")
-        for record in self.messages:
-            self.conditionalPrint(record)
+        self.logModel.refilter({item.value for item, action in self.actions.items()
+                                if action.isChecked()})
+        self.scrollToBottom()
+
+    def show_lines(self, numbers: List[int]) -> None:
+        """Show stored lines, following the end of the log if we were at it"""
+        bar = self.verticalScrollBar()
+        following = bar.value() == bar.maximum()
+        self.logModel.add(numbers)
+        if following:
+            self.scrollToBottom()
+
+    @contextlib.contextmanager
+    def held(self) -> Generator[None, None, None]:
+        """
+        Hold back the records emitted in the block and show them
+        in one go at the end, so the view only updates once.
+        """
+        self.__held = []
+        try:
+            yield
+        finally:
+            held, self.__held = self.__held, None
+            self.show_lines(held)
 
     def emit(self, record: logging.LogRecord) -> None:
-        self.messages.append(record)
-        self.conditionalPrint(record)
+        # One line per row. Tracebacks and the like get a row per line.
+        numbers = [self.store.append(record.levelno, line)
+                   for line in self.format(record).splitlines()]
+        if self.__held is not None:
+            self.__held.extend(numbers)
+        else:
+            self.show_lines(numbers)
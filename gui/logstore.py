@@ -0,0 +1,78 @@
+"""
+Keep the GUI's log lines in a fixed amount of memory.
+"""
+import heapq
+from collections import deque
+from typing import IO, Deque, Dict, Iterable, List
+
+
+class LogStore():
+    """
+    A ring buffer of the last capacity formatted log lines.
+    Every line gets a number, counting up from 0 for the first line ever added.
+    Each level keeps its own index of line numbers, so picking out the lines
+    at a few levels doesn't mean looking at every line.
+    Lines pushed out of the buffer go to the spill file, if there is one,
+    and close() writes out the ones still in it.
+    """
+
+    def __init__(self, capacity: int = 100_000, spill: str = ""):
+        self.capacity = capacity
+        self.lines: List[tuple[int, str]] = []  # (level, text), by number % capacity
+        self.levels: Dict[int, Deque[int]] = {}
+        self.total = 0  # How many lines have ever been added
+        self.spill: IO[str] | None = None
+        if spill:
+            self.spill_to(spill)
+
+    @property
+    def first(self) -> int:
+        """The number of the oldest line still stored"""
+        return max(0, self.total - self.capacity)
+
+    def spill_to(self, filename: str) -> None:
+        """Append lines that fall out of the buffer to filename from now on"""
+        if self.spill is not None:
+            self.spill.close()
+        self.spill = open(filename, "a", encoding="utf-8")
+
+    def append(self, level: int, text: str) -> int:
+        """Store a line and return its number"""
+        number = self.total
+        if number < self.capacity:
+            self.lines.append((level, text))
+        else:
+            slot = number % self.capacity
+            old_level, old_text = self.lines[slot]
+            # The oldest line overall is also the oldest at its level
+            self.levels[old_level].popleft()
+            if self.spill is not None:
+                self.spill.write(old_text + "\n")
+            self.lines[slot] = (level, text)
+        self.levels.setdefault(level, deque()).append(number)
+        self.total += 1
+        return number
+
+    def __getitem__(self, number: int) -> str:
+        return self.lines[number % self.capacity][1]
+
+    def level(self, number: int) -> int:
+        """The level of a stored line"""
+        return self.lines[number % self.capacity][0]
+
+    def select(self, levels: Iterable[int]) -> List[int]:
+        """The numbers of the stored lines at any of levels, oldest first"""
+        return list(heapq.merge(*(self.levels.get(level, ())
+                                  for level in levels)))
+
+    def close(self) -> None:
+        """
+        Write the lines still in the buffer to the spill file, so it ends
+        with the newest ones, and close it. The buffer keeps its lines.
+        """
+        if self.spill is None:
+            return
+        for number in range(self.first, self.total):
+            self.spill.write(self[number] + "\n")
+        self.spill.close()
+        self.spill = None
@@ -92,16 +92,21 @@ class Ui(QtWidgets.QMainWindow):
         self.work_thread.started.connect(self.worker.run)
 
         # Connect the threads' signals to their View counterparts
-        self.worker.logger.connect(JSpider.handle)
         self.controller.logger.connect(JSpider.handle)
-        self.worker.progressBar.connect(self.set_progress)
-        self.worker.nodesQueued.connect(self.set_nodes_queued)
-        self.worker.nodesFinished.connect(self.set_nodes_read)
+        # The worker's logs and counters are collected a few times a second
+        self.drainTimer = QtCore.QTimer(self)
+        self.drainTimer.setInterval(1000 // worker.Worker.REFRESH_HZ)
+        self.drainTimer.timeout.connect(self.drainWorker)
 
     def endController(self):
         self.control_thread.terminate()
         self.close()
 
+    def closeEvent(self, event: QtGui.QCloseEvent) -> None:
+        """Finish the log's spill file on the way out"""
+        self.logWidget.store.close()
+        super().closeEvent(event)
+
     def runButtonClicked(self):
         """Start the worker object."""
         self.loginSettingsGroupBox.setEnabled(False)
@@ -117,6 +122,7 @@ class Ui(QtWidgets.QMainWindow):
         self.pauseButton.setEnabled(True)
         self.cancelButton.setEnabled(True)
 
+        self.drainTimer.start()
         self.work_thread.start()
 
     def endWorker(self):
@@ -124,6 +130,8 @@ class Ui(QtWidgets.QMainWindow):
         self.work_thread.quit()
         self.work_thread.wait()
         JSpider.debug("Thread terminated!")
+        self.drainTimer.stop()
+        self.drainWorker()  # Whatever came in since the last tick
 
         self.pauseButton.setEnabled(False)
         self.pauseButton.setText("Pause")
@@ -156,6 +164,19 @@ class Ui(QtWidgets.QMainWindow):
     def set_progress(self, value: int) -> None:
         self.model_Progress = value
 
+    def drainWorker(self) -> None:
+        """Show everything the worker has logged since the last drain"""
+        records, counters = self.worker.drain()
+        with self.logWidget.held():
+            for record in records:
+                JSpider.handle(record)
+        if NODESQUEUED in counters:
+            self.set_nodes_queued(counters[NODESQUEUED])
+        if NODESFINISHED in counters:
+            self.set_nodes_read(counters[NODESFINISHED])
+        if PROGRESSBAR in counters:
+            self.set_progress(counters[PROGRESSBAR])
+
     @property
     def Auth(self) -> tuple[str, str]:
         """A tuple containing the login credentials"""
@@ -173,7 +194,11 @@ class Ui(QtWidgets.QMainWindow):
 
     @TeamContent.setter
     def TeamContent(self, value: bool) -> None:
-        self.teamContentRadioButton.setChecked(value)
+        # Radio buttons can't be unchecked, only have the other one checked
+        if value:
+            self.teamContentRadioButton.setChecked(True)
+        else:
+            self.myContentRadioButton.setChecked(True)
 
     @property
     def TravelPath(self) -> str:
@@ -366,7 +391,7 @@ class Ui(QtWidgets.QMainWindow):
         self.line.setFrameShadow(QtWidgets.QFrame.Shadow.Sunken)
 
 
-        self.logWidget = logger.QPlainTextEditLogger(
+        self.logWidget = logger.QListViewLogger(
             self.centralwidget, JSpider)
         self.logWidget.setFont(QtGui.QFont("Lucida Console"))
 
@@ -1,14 +1,10 @@
-from typing import List, Generator
 from PyQt6 import QtCore
 import logging
-from src.exceptions import *
-from src.driver import folderelem
+import threading
+from typing import Dict, List
 from src.logs import *
-import src.driver.excelwriter as excelwriter
-import src.driver.seleniumdriver as sd
+import src.driver.crawler as crawler
 import src.gui.ui as ui
-from selenium.common.exceptions import ElementClickInterceptedException,NoSuchElementException
-ElemType = folderelem.FolderElem.ElemType  # convenience rename
 
 
 class Worker(QtCore.QObject, logging.Handler):
@@ -18,15 +14,11 @@ class Worker(QtCore.QObject, logging.Handler):
     finished = QtCore.pyqtSignal()
     progress = QtCore.pyqtSignal(int, int)
 
-    # Signals for passing logs back to the main thread
-    logger = QtCore.pyqtSignal(logging.LogRecord)
-    nodesQueued = QtCore.pyqtSignal(int)
-    nodesFinished = QtCore.pyqtSignal(int)
-    progressBar = QtCore.pyqtSignal(int)
+    # How often the main thread collects logs and counters with drain()
+    REFRESH_HZ = 10
 
     def __init__(self, ui: 'ui.Ui') -> None:
         """Initialize the worker. Setup the logging handler"""
-        self.headless = False
         QtCore.QObject.__init__(self)
         logging.Handler.__init__(self)
 
@@ -34,138 +26,46 @@ class Worker(QtCore.QObject, logging.Handler):
         JSpider_worker.addHandler(self)  # Always use the worker
 
         self.ui = ui
-        self.consume = QtCore.QMutex()
-        JSpider_worker.log(LOCK, "consumelock locking")
-        # We can't consume until we're done setting up.
-        # (I know this isn't quite atomic but w/e)
-        self.consume.lock()
-
-        #Status flags. 
-        self.runningLock = QtCore.QMutex()
-        self.paused = False
-        self.setupLock = QtCore.QMutex()
-
-        # For typing reasons, driver is a SeleniumDriver
-        self.driver: sd.SeleniumDriver
+        # Logs and counters waiting for the main thread to drain() them.
+        # A busy crawl logs thousands of records a second, far more than
+        # the main thread could take one signal at a time.
+        self.__lock = threading.Lock()
+        self.__records: List[logging.LogRecord] = []
+        self.__counters: Dict[int, int] = {}
+        # The crawl itself. The command line settings go straight onto it.
+        self.crawler = crawler.Crawler(JSpider_worker)
 
     def run(self):
-        """Run the actual process and save the file afterwards."""
-
-        self.username, self.password = self.ui.Auth
-        # If there's no uname/passw, this is a dead run.
-        if self.username == "" or self.password == "":
-            JSpider_worker.error("Username and password cannot be blank")
-            self.finished.emit()
-            return
-
-        self.direction = "Team Content" if self.ui.TeamContent else "My Content"
-
-        JSpider_worker.log(LOCK, "setuplock locking")
-        self.setupLock.lock()
-        self.driver = sd.SeleniumDriver(JSpider_worker,
-                                        self.ui.geckodriver,
-                                        self.ui.executable,
-                                        self.headless,
-                                        "Team Content" if self.ui.TeamContent
-                                        else "My Content")
-
-        self.setupLock.unlock()
-        JSpider_worker.log(LOCK, "setupLock unlocked")
-
-        self.driver.login(self.username, self.password)
-        self.driver.open_slider()
-        try:
-            self.driver.travel_path(self.ui.TravelPath)
-
-            JSpider_worker.info(
-                "Selenium is queued and ready. Initializing excel file")
-            self.excel_file = excelwriter.ExcelWriter()
-            self.driver.enableScrollToBottom()
-            self.nq = self.nr = 0
-            self.level = 1
-            JSpider_worker.debug("Traversing")
-            self.consume.unlock()  # We're cleared for launch
-            try:
-                for element in self.__traverse():
-                    self.excel_file.append(element)
-            except EarlyLeaveException:
-                self.driver.driver.quit()    
-                self.driver.cancel = False #We're done failing out. Worker is closed. 
-            JSpider_worker.info("Saving")
-            self.excel_file.write_wb(self.ui.ExportFileName)
-            JSpider_worker.log(NODESFINISHED, 0)
-            JSpider_worker.log(NODESQUEUED, 0)
-            JSpider_worker.log(PROGRESSBAR, 0)
-            self.driver.driver.quit()
-            JSpider_worker.info("Run finished")
-
-            self.finished.emit()
-        # No guarantee that self.driver exists. If it doesn't, that's OK
-        except AttributeError:
-            JSpider_worker.debug("Error: Couldn't find driver")
-        # Helps us cancel the program in a happy way
-        except EarlyLeaveException:
-            pass #Fail out of the run loop quietly. 
-                 #This is an expected condition, and doesn't need to be handled
-        except LoginException:
-            JSpider_worker.error("Closing driver.")
-            pass #Notification is handled in seleniumdriver
-                 # and cleanup is handled in finally clause
-        except (NoSuchElementException,
-                ElementClickInterceptedException):
-            #Looks like something went wrong with the driver. 
-            JSpider_worker.error("Something went wrong with the driver. Please check logs.")
-
-        finally:
-            self.driver.driver.quit()
-            self.finished.emit()
+        """Copy the settings out of the ui and run the crawl."""
+        self.crawler.username, self.crawler.password = self.ui.Auth
+        self.crawler.team_content = self.ui.TeamContent
+        self.crawler.travel_path = self.ui.TravelPath
+        self.crawler.export_filename = self.ui.ExportFileName
+        self.crawler.geckodriver = self.ui.geckodriver
+        # Not needed (and so maybe not set) for the http backend
+        self.crawler.executable = getattr(self.ui, "executable", "")
+        self.crawler.run()
+        self.finished.emit()
 
-    def __traverse(self) -> Generator[folderelem.FolderElem, None, None]:
-        """Actually do the traversal. This method is recursive"""
-        JSpider_worker.log(LOCK, "consumelock locking")
-        self.consume.lock()
-        for element in self.driver.readCurrentFolder():
-            if isinstance(element, folderelem.FolderElem):
-                yield element
-
-            # At the very end of a run, the generator will
-            # yield a list of folders
-            elif isinstance(element, List):
-                # Typehinting assertion: folders contains folderelems.
-                folders: List[folderelem.FolderElem] = element
-                for folder in folders:
-                    JSpider_worker.debug(f"found a folder item: {element}")
-                    self.driver.travel(folder.name)
-
-                    self.consume.unlock()  # A safe place to PAUSE or QUIT
-                    JSpider_worker.log(LOCK, "consumelock unlocked")
-
-                    JSpider_worker.debug(f"{folder.path}")
-                    yield from self.__traverse()
-
-                    JSpider_worker.log(LOCK, "consumelock locking")
-                    self.consume.lock()
-
-                    self.driver.travel("..")  # go back up
+    def emit(self, record: logging.LogRecord) -> None:
+        """
+        Hold on to the log record until the main thread drains it.
+        Only the latest value of each counter is kept.
+        """
+        with self.__lock:
+            if record.levelno in (PROGRESSBAR, NODESQUEUED, NODESFINISHED):
+                self.__counters[record.levelno] = int(record.msg)
             else:
-                raise TypeError(   #This should never be hit, but better safe than sorry
-                    "Received an unknown type from selenium driver")
+                record.msg = "[W]:"+record.msg
+                self.__records.append(record)
 
-        self.consume.unlock()  # done with the function. Free up consumelock
-        JSpider_worker.log(LOCK, "consumelock unlocked")
-        return
-
-    def emit(self, record: logging.LogRecord) -> None:
+    def drain(self) -> tuple[List[logging.LogRecord], Dict[int, int]]:
         """
-        Sort out the correct channel 
-        for the log record to send on and send it
+        Take the records logged since the last drain, and the latest
+        value of each counter that changed (keyed by log level).
+        Safe to call from any thread.
         """
-        if record.levelno == PROGRESSBAR:
-            self.progressBar.emit(int(record.msg))
-        elif record.levelno == NODESQUEUED:
-            self.nodesQueued.emit(int(record.msg))
-        elif record.levelno == NODESFINISHED:
-            self.nodesFinished.emit(int(record.msg))
-        else:
-            record.msg = "[W]:"+record.msg
-            self.logger.emit(record)
+        with self.__lock:
+            records, self.__records = self.__records, []
+            counters, self.__counters = self.__counters, {}
+        return records, counters
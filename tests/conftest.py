@@ -0,0 +1,96 @@
+"""
+Run from the directory holding src with
+    python -m pytest src/tests
+"""
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Generator
+from urllib.parse import unquote, urlsplit
+
+import pytest
+
+RECORDED = os.path.join(os.path.dirname(__file__), "recorded")
+PREFIX = "/ibmcognos11/bi"
+PASSWORD = "password"
+
+
+class ReplayServer():
+    """
+    Answer HttpDriver's requests with recorded responses: items.json holds
+    the body of every /v1/objects/ID/items response, by object id.
+    """
+
+    def __init__(self, recording: str = "items.json"):
+        with open(os.path.join(RECORDED, recording), encoding="utf-8") as file:
+            self.items: Dict[str, dict] = json.load(file)
+        self.requests: list[str] = []  # Paths asked for, in order
+        replay = self
+
+        class Handler(ReplayHandler):
+            server_ = replay
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{PREFIX}"
+
+    def start(self) -> str:
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_: ReplayServer
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def send(self, status: int, body: dict, headers: dict = {}) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        path = urlsplit(self.path).path
+        self.server_.requests.append(path)
+        object_id = unquote(path[len(PREFIX + "/v1/objects/"):-len("/items")])
+        if not (path.startswith(PREFIX + "/v1/objects/") and path.endswith("/items")) \
+                or object_id not in self.server_.items:
+            self.send(404, {})
+            return
+        if self.headers.get("X-XSRF-Token") != "recorded":
+            self.send(403, {})
+            return
+        self.send(200, self.server_.items[object_id])
+
+    def do_PUT(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        fields = {field["name"]: field["value"] for field in body["parameters"]}
+        if urlsplit(self.path).path != PREFIX + "/v1/login" \
+                or fields.get("CAMPassword") != PASSWORD:
+            self.send(401, {})
+            return
+        self.send(200, {}, {"Set-Cookie": "XSRF-TOKEN=recorded; Path=/"})
+
+
+@pytest.fixture
+def recorded_cognos() -> Generator[ReplayServer, None, None]:
+    """A stand-in cognos serving the listings in recorded/items.json"""
+    server = ReplayServer()
+    server.start()
+    yield server
+    server.stop()
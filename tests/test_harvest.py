@@ -0,0 +1,148 @@
+"""
+The Harvester, and SeleniumDriver.read_rows around it, against a scripted
+stand-in for a DataTable that lazy-loads its rows as it's scrolled.
+"""
+import logging
+from typing import List
+
+import pytest
+
+pytest.importorskip("selenium")
+from selenium.common.exceptions import JavascriptException, TimeoutException
+
+from src.driver.harvest import HARVEST_SCRIPT, Harvester
+from src.driver.seleniumdriver import SeleniumDriver
+
+
+class Row():
+    def __init__(self, name: str, title: str):
+        self.name = name
+        self.title = title
+        self.read = False  # HARVEST_SCRIPT's __jspiderRead
+
+
+class ScriptedTable():
+    """
+    Does what HARVEST_SCRIPT does in a browser, to a folder of total rows
+    (every tenth a Folder) of which the table loads page at a time: the
+    first page up front, and each next one the call after a scroll to the
+    bottom. redraw_at puts the last few rows of that page back as fresh,
+    unread rows, like a DataTables redraw does. fail_at raises error on
+    that call instead.
+    """
+
+    def __init__(self, total: int, page: int = 100, visible: int = 20,
+                 redraw_at: int = -1, fail_at: int = -1,
+                 error: Exception | None = None):
+        self.rows = [Row(f"Item {i:05}", "Folder" if i % 10 == 0 else "Report")
+                     for i in range(total)]
+        self.page = page
+        self.visible = visible
+        self.redraw_at = redraw_at
+        self.fail_at = fail_at
+        self.error = error
+        self.dom: List[Row] = self.rows[:page]
+        self.loaded = min(page, total)
+        self.pending = False  # Scrolled to the bottom, next page on its way
+        self.calls = 0
+        self.largest_dom = len(self.dom)
+
+    def execute_script(self, script: str, pane: object, limit: int,
+                       prune: bool) -> dict:
+        assert script == HARVEST_SCRIPT
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise self.error  # type:ignore
+        if self.pending:
+            self.pending = False
+            page = self.rows[self.loaded:self.loaded + self.page]
+            self.dom += page
+            self.loaded += len(page)
+            if self.loaded // self.page == self.redraw_at:
+                self.dom += [Row(row.name, row.title) for row in page[-3:]]
+        self.largest_dom = max(self.largest_dom, len(self.dom))
+
+        rows, more = [], False
+        for row in list(self.dom):
+            if row.read:
+                continue
+            if len(rows) >= limit:
+                more = True
+                break
+            row.read = True
+            rows.append([row.name, row.title])
+            if prune and row.title != "Folder":
+                self.dom.remove(row)
+        if not more and self.loaded < len(self.rows):
+            self.pending = True
+        return {"rows": rows, "more": more, "loading": self.pending,
+                "height": 20*len(self.dom),
+                "scrolls": len(self.dom) > self.visible}
+
+
+class Pane():
+    """The folder pane, for the row by row fallback"""
+
+    def __init__(self):
+        self.asked = 0
+
+    def find_elements(self, by: str, xpath: str) -> list:
+        self.asked += 1
+        return []
+
+
+def harvester(table: ScriptedTable) -> Harvester:
+    return Harvester(table, None, quiet_ms=20, poll=.001)  # type:ignore
+
+
+def test_lazy_loaded_folder_comes_back_whole():
+    table = ScriptedTable(2500, redraw_at=5)
+    harvest = harvester(table)
+    rows = harvest.harvest()
+    assert rows == [(row.name, row.title) for row in table.rows]
+    assert harvest.duplicates == 3
+    assert harvest.pruned
+    # 1000 rows before pruning starts, a page, and the folder rows kept after
+    assert table.largest_dom <= 1000 + 100 + 150
+
+
+def test_folder_that_fits_takes_one_call():
+    table = ScriptedTable(15)
+    harvest = harvester(table)
+    assert len(harvest.harvest()) == 15
+    assert harvest.chunks == 1
+    assert not harvest.pruned
+
+
+def reader(table: ScriptedTable) -> tuple[SeleniumDriver, Pane]:
+    """A SeleniumDriver reading table, with no firefox behind it"""
+    driver = SeleniumDriver(logging.getLogger("test"), "")
+    driver._SeleniumDriver__driver = table  # type:ignore
+    driver.pane = Pane()  # type:ignore
+    return driver, driver.pane  # type:ignore
+
+
+def test_failure_after_pruning_fails_the_folder():
+    # A page a call, so pruning starts on the eleventh. Fail on the thirteenth.
+    table = ScriptedTable(2500, fail_at=13, error=TimeoutException("slow"))
+    driver, pane = reader(table)
+    with pytest.raises(TimeoutException):
+        driver.read_rows()
+    assert pane.asked == 0  # No read of a DOM that lost rows
+    assert driver.bulk_read
+
+
+def test_failure_before_pruning_falls_back_for_one_folder():
+    table = ScriptedTable(2500, fail_at=1, error=TimeoutException("slow"))
+    driver, pane = reader(table)
+    assert driver.read_rows() == []
+    assert pane.asked == 1
+    assert driver.bulk_read  # The next folder gets the script again
+
+
+def test_broken_script_turns_bulk_read_off():
+    table = ScriptedTable(50, fail_at=1, error=JavascriptException("$ is undefined"))
+    driver, pane = reader(table)
+    driver.read_rows()
+    assert pane.asked == 1
+    assert not driver.bulk_read
@@ -0,0 +1,82 @@
+"""
+HttpDriver against recorded listing responses.
+"""
+import logging
+
+import pytest
+
+from src.driver.control import ControlChannel
+from src.driver.folderelem import FolderElem
+from src.driver.httpdriver import HttpDriver
+from src.driver.traversal import AsyncTraverser
+from src.exceptions import LoginException
+
+from conftest import PASSWORD
+
+T = FolderElem.ElemType
+LOGGER = logging.getLogger("test")
+
+# Every row under /Finance/ in recorded/items.json: (type, path, name, modified)
+FINANCE = {
+    (T.Report, "/Finance/", "Headcount", "2026-10-01T08:15:33.129Z"),
+    (T.Active_Report, "/Finance/", "Quarterly close", "2026-07-14T13:50:09.668Z"),
+    (T.Dashboard, "/Finance/", "Overview", "2026-09-28T10:05:17.402Z"),
+    (T.CSV, "/Finance/Payroll/", "Pay periods.csv", "2026-10-05T09:42:50.117Z"),
+    (T.XLSX, "/Finance/Payroll/", "Rates.XLSX", "2026-06-11T15:31:02.945Z"),
+    (T.Uploaded_file, "/Finance/Payroll/", "Notes.txt", "2025-12-03T12:00:41.236Z"),
+    (T.Report, "/Finance/Payroll/", "Payroll register", "2026-09-30T17:22:58.013Z"),
+    (T.Report_View, "/Finance/Payroll/", "Payroll register (saved)",
+     "2026-10-01T06:00:03.500Z"),
+    (T.UnknownType, "/Finance/Payroll/", "Legacy extract", "2023-05-22T09:18:36.771Z"),
+    (T.Data_module, "/Finance/Payroll/", "Payroll model", "2026-04-09T14:44:12.380Z"),
+    (T.Package, "/Finance/Budget/", "Budget package", "2026-02-17T10:36:29.054Z"),
+    (T.Query, "/Finance/Budget/", "Variance", "2026-08-02T08:49:55.617Z"),
+    (T.Shortcut, "/Finance/Budget/", "Link to Headcount", "2026-03-25T13:13:13.131Z"),
+    (T.Story, "/Finance/Budget/FY27/", "Requests", "2026-08-19T16:03:22.871Z"),
+    (T.Agent, "/Finance/Budget/FY27/", "Nightly", "2026-05-06T02:00:00.000Z"),
+    (T.Empty_Folder, "/Finance/Archive/", "Archive", ""),
+}
+
+
+def logged_in(server) -> HttpDriver:
+    driver = HttpDriver(LOGGER, server.base_url, pool_size=4)
+    driver.login("tester", PASSWORD)
+    return driver
+
+
+def test_list_folder(recorded_cognos):
+    driver = logged_in(recorded_cognos)
+    driver.travel_path("/Finance/")
+    files, folders = driver.list_folder(driver.path)
+
+    assert [(elem.type, elem.name) for elem in folders] == \
+        [(T.Folder, "Payroll"), (T.Folder, "Budget"), (T.Folder, "Archive")]
+    # In the order cognos listed them
+    assert [(elem.type, elem.path, elem.name, elem.modified) for elem in files] == [
+        (T.Report, "/Finance/", "Headcount", "2026-10-01T08:15:33.129Z"),
+        (T.Active_Report, "/Finance/", "Quarterly close", "2026-07-14T13:50:09.668Z"),
+        (T.Dashboard, "/Finance/", "Overview", "2026-09-28T10:05:17.402Z")]
+    assert files[0].link == \
+        recorded_cognos.base_url + "/?pathRef=.public_folders%2FFinance/Headcount"
+    driver.quit()
+
+
+def test_crawl(recorded_cognos):
+    driver = logged_in(recorded_cognos)
+    driver.travel_path("/Finance/")
+    rows = []
+    AsyncTraverser(LOGGER, [driver]*driver.pool_size, [driver.path],
+                   ControlChannel()).run(rows.append)
+
+    assert len(rows) == len(FINANCE)
+    assert {(elem.type, elem.path, elem.name, elem.modified) for elem in rows} == FINANCE
+    # Each folder is listed once, and /Finance/ is found from the root
+    listed = recorded_cognos.requests
+    assert len(listed) == len(set(listed)) == 6
+    driver.quit()
+
+
+def test_bad_password(recorded_cognos):
+    driver = HttpDriver(LOGGER, recorded_cognos.base_url)
+    with pytest.raises(LoginException):
+        driver.login("tester", "wrong")
@@ -0,0 +1,81 @@
+"""
+Sharded crawls with real worker processes, against the simulator.
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+import src
+import src.cli as cli
+from src.benchmarks.simulator import PASSWORD, Simulator, Tree
+from src.driver.shards import Coordinator, merge
+from src.driver.sinks import JsonlSink
+
+# python -m src has to work in the workers
+TOP = os.path.dirname(os.path.dirname(os.path.abspath(src.__file__)))
+
+
+@pytest.fixture
+def cognos():
+    sim = Simulator(Tree(depth=3, fanout=4, files=5), latency=.05)
+    sim.start()
+    yield sim
+    sim.stop()
+
+
+@pytest.fixture
+def no_login_in_env(monkeypatch):
+    monkeypatch.chdir(TOP)
+    monkeypatch.delenv("JSPIDER_USER", raising=False)
+    monkeypatch.delenv("JSPIDER_PASSWORD", raising=False)
+
+
+def rows(filename: str) -> set:
+    with open(filename, encoding="utf-8") as file:
+        return {(row["path"], row["name"]) for row in map(json.loads, file)}
+
+
+def test_workers_get_the_login_from_the_shards_directory(cognos, tmp_path,
+                                                         no_login_in_env):
+    export = str(tmp_path/"out.xlsx")
+    done = subprocess.run(
+        [sys.executable, "-m", "src", "--batch", "-b", "http",
+         "-U", cognos.base_url, "-t", "/Finance/", "-e", export,
+         "-o", "jsonl:" + str(tmp_path/"out.jsonl"), "-S", "2",
+         "-u", "tester", "-p", PASSWORD],
+        stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=120)
+    assert done.returncode == 0, done.stdout + done.stderr
+
+    assert len(rows(str(tmp_path/"out.jsonl"))) == cognos.tree.rows()
+    assert not os.path.exists(os.path.join(export + ".shards", "credentials.json"))
+    with open(export + ".manifest.json", encoding="utf-8") as file:
+        manifest = json.load(file)
+    assert [shard["status"] for shard in manifest["shards"]] == ["done"]*4
+
+
+def test_split_shares_leftover_folders_between_workers(cognos, tmp_path,
+                                                       no_login_in_env):
+    export = str(tmp_path/"out.xlsx")
+    args = cli.init_argparse().parse_args(
+        ["--batch", "-b", "http", "-U", cognos.base_url, "-e", export])
+    directory = export + ".shards"
+    coordinator = Coordinator(logging.getLogger("test"),
+                              lambda shard: cli.shard_command(args, shard),
+                              3, directory, split_after=1, poll=.1)
+    cli.write_credentials(cli.credentials_file(args), "tester", PASSWORD)
+    # The whole tree in one shard, so it's sure to be split
+    coordinator.add("/Finance/")
+    assert coordinator.run()
+
+    split = [shard for shard in coordinator.shards if shard.status == "split"]
+    assert split
+    # However many folders each had left, no more than three shards apiece
+    assert len(coordinator.shards) <= 1 + 3*len(split)
+    assert any(len(shard.folders) > 1 for shard in coordinator.shards)
+    merged = str(tmp_path/"merged.jsonl")
+    merge(coordinator.outputs(), JsonlSink(merged))
+    assert len(rows(merged)) == cognos.tree.rows()
@@ -0,0 +1,57 @@
+"""
+What AsyncTraverser does with folders that can't be read.
+"""
+import logging
+from typing import List
+
+import pytest
+
+from src.driver.control import ControlChannel
+from src.driver.folderelem import FolderElem
+from src.driver.traversal import AsyncTraverser
+from src.exceptions import StateException
+
+T = FolderElem.ElemType
+LOGGER = logging.getLogger("test")
+
+
+class Lister():
+    """/Root/ holds a report and the folders A and B. Reading B raises error."""
+
+    def __init__(self, error: Exception):
+        self.error = error
+        self.reads: List[str] = []
+
+    def list_folder(self, path: List[str]) \
+            -> tuple[List[FolderElem], List[FolderElem]]:
+        key = "/" + "".join(name + "/" for name in path)
+        self.reads.append(key)
+        if path == ["Root"]:
+            return ([FolderElem(T.Report, "Report", key, "")],
+                    [FolderElem(T.Folder, name, key, "") for name in "AB"])
+        if path == ["Root", "B"]:
+            raise self.error
+        return [FolderElem(T.Report, "Report", key, "")], []
+
+
+def crawl(lister: Lister) -> tuple[AsyncTraverser, List[str]]:
+    traverser = AsyncTraverser(LOGGER, [lister, lister], [["Root"]],
+                               ControlChannel(), retries=2)
+    rows: List[str] = []
+    traverser.run(lambda row: rows.append(row.path))
+    return traverser, rows
+
+
+def test_unreadable_folder_is_retried_then_quarantined():
+    lister = Lister(StateException("Cognos returned 500 listing /Root/B/"))
+    traverser, rows = crawl(lister)
+    assert sorted(rows) == ["/Root/", "/Root/A/"]
+    assert lister.reads.count("/Root/B/") == 3
+    assert list(traverser.quarantine) == [("Root", "B")]
+
+
+def test_bug_in_a_lister_stops_the_crawl():
+    lister = Lister(KeyError("B"))
+    with pytest.raises(KeyError):
+        crawl(lister)
+    assert lister.reads.count("/Root/B/") == 1